@@ -0,0 +1,151 @@
+"""Cached index of the Areas database (area id -> name and Maslow level).
+
+Looking areas up used to re-read the whole Areas database on every run.
+`AreaIndex` keeps the mapping in memory, and on disk if given a path, and
+only rebuilds it when it may be stale:
+
+- within `ttl` seconds of the last check, the cached index is used as is;
+- after that, one single-row query asks Notion for the most recently
+  edited area. If its `last_edited_time` matches the cached one, the index
+  is still current and only the check time is bumped;
+- otherwise the Areas database is re-read (from the mirror, if one is set).
+
+Deleted areas aren't visible to the edit-time check; call `invalidate()`
+(or `load(force=True)`) to force a rebuild.
+"""
+import json
+import os
+import time
+
+from notion_pagination import iter_query_results
+from notion_schema import compile_extractor
+from notion_query import QueryBuilder
+
+DEFAULT_TTL = 15 * 60
+UNCATEGORIZED = 'Uncategorized'
+
+
+class AreaIndex:
+    def __init__(self, notion, database_id, property_map, ttl=DEFAULT_TTL, path=None,
+                 mirror=None, verbose=False):
+        self.notion = notion
+        self.database_id = database_id
+        self.property_map = property_map
+        self.ttl = ttl
+        self.path = path
+        self.mirror = mirror
+        self.verbose = verbose
+        self._areas = None
+        self._last_edited_time = None
+        self._checked_at = 0.0
+        self._extractor = None
+        self._read_cache_file()
+
+    def _read_cache_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            if cached.get('database_id') == self.database_id:
+                self._areas = cached['areas']
+                self._last_edited_time = cached.get('last_edited_time')
+                self._checked_at = cached.get('checked_at', 0.0)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: Ignoring unreadable area cache {self.path}: {e}")
+
+    def _write_cache_file(self):
+        if not self.path:
+            return
+        with open(self.path, 'w') as f:
+            json.dump({
+                'database_id': self.database_id,
+                'areas': self._areas,
+                'last_edited_time': self._last_edited_time,
+                'checked_at': self._checked_at,
+            }, f)
+
+    def invalidate(self):
+        """Drop the cached index so the next load re-reads the Areas database"""
+        self._areas = None
+        self._last_edited_time = None
+        self._checked_at = 0.0
+
+    def _latest_edit(self):
+        response = self.notion.databases.query(
+            database_id=self.database_id,
+            sorts=[{"timestamp": "last_edited_time", "direction": "descending"}],
+            page_size=1
+        )
+        results = response.get('results', [])
+        return results[0].get('last_edited_time') if results else None
+
+    def _iter_pages(self):
+        if self.mirror is None:
+            query = QueryBuilder(self._extractor).select()
+            return iter_query_results(self.notion, self.database_id, **query.build())
+        self.mirror.sync(self.notion, self.database_id)
+        return self.mirror.iter_pages(self.database_id)
+
+    def _rebuild(self):
+        if self._extractor is None:
+            self._extractor = compile_extractor(self.notion, self.database_id, self.property_map)
+
+        areas = {}
+        latest = None
+        for page in self._iter_pages():
+            edited = page.get('last_edited_time')
+            if edited and (latest is None or edited > latest):
+                latest = edited
+
+            fields = self._extractor.extract(page)
+            area_name = fields.get('name')
+            if not area_name:
+                if self.verbose:
+                    print(f"Warning: Could not get name for area {page['id']}")
+                continue
+            maslow_level = fields.get('maslow_level', UNCATEGORIZED)
+            areas[page['id']] = {'name': area_name, 'level': maslow_level}
+            if self.verbose:
+                print(f"Mapped area: {area_name} -> {maslow_level}")
+
+        self._areas = areas
+        self._last_edited_time = latest
+
+    def load(self, force=False):
+        """Return {area_id: {'name', 'level'}}, refreshing it only when it may be stale"""
+        now = time.time()
+        if not force and self._areas is not None and now - self._checked_at < self.ttl:
+            return self._areas
+
+        if force or self._areas is None or self._latest_edit() != self._last_edited_time:
+            self._rebuild()
+        self._checked_at = now
+        self._write_cache_file()
+        return self._areas
+
+    def resolve(self, area_ids):
+        """Resolve every related area of a task against the current index"""
+        return resolve_areas(self.load(), area_ids)
+
+
+def resolve_areas(areas, area_ids):
+    """
+    Resolve every related area of a task.
+
+    Args:
+        areas (dict): {area_id: {'name', 'level'}} as returned by AreaIndex.load
+        area_ids (list): Ids from the task's Areas relation
+
+    Returns:
+        tuple: (area names, distinct Maslow levels), both in relation order
+    """
+    names = []
+    levels = []
+    for area_id in area_ids or ():
+        info = areas.get(area_id, {})
+        names.append(info.get('name', UNCATEGORIZED))
+        level = info.get('level', UNCATEGORIZED)
+        if level not in levels:
+            levels.append(level)
+    return tuple(names), tuple(levels)
@@ -1,48 +1,89 @@
-import requests
-import openai
 import os
+import sys
 from dotenv import load_dotenv
+import clients
+from llm_cache import ChatStream, LLMCache, cached_chat_content
+from prompt_packer import MapReducePrompter
 
-# Load environment variables from .env file
-load_dotenv()
+# OpenAI client, created on first use
+_openai_client = None
 
-# API Keys and Database ID
-notion_api_key = os.getenv('NOTION_API_KEY')
-openai.api_key = os.getenv('OPENAI_API_KEY')
-notion_database_id = os.getenv('NOTION_DATABASE_ID')
-
-# Notion Headers
-notion_headers = {
-    "Authorization": f"Bearer {notion_api_key}",
-    "Content-Type": "application/json",
-    "Notion-Version": "2022-06-28"
-}
+def get_openai_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = clients.openai_client()
+    return _openai_client
 
 def fetch_notion_data(database_id):
     """Fetch data from the Notion database."""
-    url = f'https://api.notion.com/v1/databases/{database_id}/query'
-    response = requests.post(url, headers=notion_headers)
+    with clients.notion_http_client() as http:
+        response = http.post(f'databases/{database_id}/query', json={})
     return response.json()
 
-def query_gpt(prompt):
-    """Send a prompt to OpenAI GPT and return the response."""
+def gpt_request(prompt):
+    """Chat completion arguments for a prompt."""
+    return dict(
+        model="gpt-3.5-turbo",  # Use "gpt-4" if you have access
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=150,
+        temperature=0.7
+    )
+
+def query_gpt(prompt, cache=None):
+    """Send a prompt to OpenAI GPT and return the response.
+
+    If an LLMCache is given, identical prompts are answered from it.
+    """
+    try:
+        return cached_chat_content(get_openai_client(), cache, **gpt_request(prompt)).strip()
+    except Exception as e:
+        return f"Error: {e}"
+
+def stream_gpt(prompt, cache=None):
+    """Send a prompt to OpenAI GPT and return a ChatStream of the response as it arrives."""
+    return ChatStream(get_openai_client(), cache, **gpt_request(prompt))
+
+def print_stream(stream, out=sys.stdout):
+    """Print a ChatStream as it arrives, then its timings on stderr; returns False on error."""
+    try:
+        for delta in stream:
+            out.write(delta)
+            out.flush()
+    except Exception as e:
+        out.write(f"Error: {e}")
+        return False
+    finally:
+        out.write("\n")
+    print(f"({stream.summary()})", file=sys.stderr)
+    return True
+
+def recommend_tasks(tasks, cache=None, stream=False):
+    """Ask GPT how to prioritize a task list of any length (see prompt_packer).
+
+    With `stream=True` the answer is returned as a ChatStream.
+    """
+    prompter = MapReducePrompter.from_env(get_openai_client(), cache, model="gpt-3.5-turbo")
+
+    def prompt(items):
+        return f"Here are my tasks: {items}. What should I prioritize and how can I organize my day?"
+
+    if stream:
+        return prompter.run(tasks, prompt, max_tokens=150, stream=True)
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",  # Use "gpt-4" if you have access
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=150,
-            temperature=0.7
-        )
-        return response['choices'][0]['message']['content'].strip()
+        return prompter.run(tasks, prompt, max_tokens=150).strip()
     except Exception as e:
         return f"Error: {e}"
 
 if __name__ == '__main__':
+    # Load environment variables from .env file
+    load_dotenv()
+
     # Fetch data from Notion
-    data = fetch_notion_data(notion_database_id)
+    data = fetch_notion_data(os.getenv('NOTION_DATABASE_ID'))
 
     # Extract tasks from the Notion database response
     tasks = []
@@ -57,12 +98,12 @@ if __name__ == '__main__':
     if not tasks:
         print("No tasks found in the Notion database.")
     else:
-        # Format tasks into a prompt for ChatGPT
-        task_prompt = f"Here are my tasks: {tasks}. What should I prioritize and how can I organize my day?"
-
-        # Query ChatGPT for recommendations
-        recommendations = query_gpt(task_prompt)
-
-        # Print the recommendations
+        # Query ChatGPT for recommendations, in chunks if the list is long,
+        # and print the answer as it arrives
         print("GPT Recommendations:")
-        print(recommendations)
+        try:
+            stream = recommend_tasks(tasks, cache=LLMCache.from_env(), stream=True)
+        except Exception as e:
+            print(f"Error: {e}")
+        else:
+            print_stream(stream)
@@ -1,14 +1,45 @@
-from openai import OpenAI
 from dotenv import load_dotenv
-import os
+from clients import openai_client
+from llm_cache import LLMCache
+from prompt_packer import MapReducePrompter, bullet_list
 
-# Load environment variables
-load_dotenv()
+RECOMMENDATION_PROMPT = """Please analyze these tasks and provide recommendations for prioritization:
+        
+        {task_list}
+        
+        Please consider urgency, importance, and dependencies between tasks."""
+
+
+def recommendation_prompt(tasks):
+    return RECOMMENDATION_PROMPT.format(task_list=bullet_list(tasks))
 
 class AssistantManager:
-    def __init__(self):
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    def __init__(self, cache=None):
+        load_dotenv()
+        # OpenAI client, created on first use so mock recommendations need no SDK
+        self._client = None
+        # Optional LLMCache so identical prompts are only sent once
+        self.cache = cache
+        self._prompter = None
+
+    @property
+    def client(self):
+        """The OpenAI client, created on first use"""
+        if self._client is None:
+            self._client = openai_client()
+        return self._client
+
+    @property
+    def prompter(self):
+        """The map-reduce prompter for long task lists (see prompt_packer), created on first use"""
+        if self._prompter is None:
+            self._prompter = MapReducePrompter.from_env(
+                self.client,
+                self.cache,
+                model="gpt-3.5-turbo",  # Using the more cost-effective model
+                system="You are a helpful assistant that analyzes tasks and provides prioritization recommendations."
+            )
+        return self._prompter
     
     def get_gpt_recommendation(self, tasks):
         """
@@ -20,47 +51,43 @@ class AssistantManager:
         Returns:
             str: GPT's recommendation
         """
-        # Format tasks into a clear prompt
-        task_list = "\n".join([f"- {task}" for task in tasks])
-        prompt = f"""Please analyze these tasks and provide recommendations for prioritization:
-        
-        {task_list}
-        
-        Please consider urgency, importance, and dependencies between tasks."""
-
+        # Long lists are shortlisted in parallel chunks before the final request
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # Using the more cost-effective model
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that analyzes tasks and provides prioritization recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            return response.choices[0].message.content
+            return self.prompter.run(tasks, recommendation_prompt, max_tokens=500)
             
         except Exception as e:
             return f"Error getting recommendation: {str(e)}"
 
+    def stream_gpt_recommendation(self, tasks):
+        """
+        Get task recommendations from GPT as they are generated
+
+        Returns:
+            ChatStream: Iterate for content deltas; its `summary()` gives
+            time to first token and total duration (see llm_cache)
+        """
+        return self.prompter.run(tasks, recommendation_prompt, max_tokens=500, stream=True)
+
     def get_mock_recommendation(self, tasks):
         """
         Get a mock recommendation for testing without using API credits
         """
-        task_list = "\n".join([f"- {task}" for task in tasks])
+        priorities = [
+            "1. Highest Priority: {} - This should be tackled first as it appears most urgent.",
+            "2. Medium Priority: {} - Can be worked on after the first task is complete.",
+            "3. Lower Priority: {} - Can be scheduled for later.",
+        ]
+        ranked = "\n".join(line.format(task) for line, task in zip(priorities, tasks))
         return f"""Here's a mock prioritization of your tasks:
 
-1. Highest Priority: {tasks[0]} - This should be tackled first as it appears most urgent.
-2. Medium Priority: {tasks[1]} - Can be worked on after the first task is complete.
-3. Lower Priority: {tasks[2]} - Can be scheduled for later.
+{ranked}
 
 This is a mock response for testing purposes."""
 
 # Example usage
 if __name__ == "__main__":
     # Test the integration
-    assistant = AssistantManager()
+    assistant = AssistantManager(cache=LLMCache.from_env())
     sample_tasks = [
         "Update project documentation",
         "Fix OpenAI API integration",
@@ -0,0 +1,122 @@
+"""Asyncio Notion access layer with a shared token-bucket rate limiter.
+
+Notion allows an average of about three requests per second per
+integration. Rather than sleeping a fixed amount after every task, all
+requests made through an `AsyncNotion` draw from one token bucket, and a
+429 response pauses the whole bucket for the server's Retry-After delay.
+A semaphore bounds how many requests are in flight at once.
+"""
+import asyncio
+import os
+
+from notion_client import APIErrorCode, APIResponseError
+
+from clients import async_notion_client
+from metrics import METRICS
+from notion_pagination import NOTION_MAX_PAGE_SIZE
+
+DEFAULT_RATE = 3.0
+DEFAULT_CONCURRENCY = 3
+DEFAULT_MAX_RETRIES = 5
+
+
+class TokenBucket:
+    def __init__(self, rate=DEFAULT_RATE, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        if self._updated is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds`, e.g. after a 429"""
+        now = asyncio.get_running_loop().time()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+
+
+def retry_after_seconds(error, attempt):
+    """Seconds to wait before retrying a rate-limited request"""
+    headers = getattr(error, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30)
+
+
+class AsyncNotion:
+    def __init__(self, auth=None, rate=None, max_concurrency=None, max_retries=DEFAULT_MAX_RETRIES):
+        self.client = async_notion_client(auth)
+        self.bucket = TokenBucket(rate or float(os.getenv('NOTION_RATE_LIMIT', DEFAULT_RATE)))
+        self.max_concurrency = max_concurrency or int(os.getenv('NOTION_MAX_CONCURRENCY', DEFAULT_CONCURRENCY))
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.max_retries = max_retries
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def request(self, method, **kwargs):
+        """Call an AsyncClient endpoint method under the rate limit, retrying 429s"""
+        attempt = 0
+        while True:
+            async with self.semaphore:
+                await self.bucket.acquire()
+                try:
+                    return await method(**kwargs)
+                except APIResponseError as e:
+                    if e.code != APIErrorCode.RateLimited or attempt >= self.max_retries:
+                        raise
+                    METRICS.record_retry('notion', 'rate_limited')
+                    self.bucket.pause(retry_after_seconds(e, attempt))
+            attempt += 1
+
+    async def query_database(self, database_id, **query):
+        return await self.request(self.client.databases.query, database_id=database_id, **query)
+
+    async def retrieve_database(self, database_id):
+        return await self.request(self.client.databases.retrieve, database_id=database_id)
+
+    async def update_page(self, page_id, properties):
+        return await self.request(self.client.pages.update, page_id=page_id, properties=properties)
+
+    async def iter_query_results(self, database_id, page_size=NOTION_MAX_PAGE_SIZE, **query):
+        """Async generator over every page of a database query, following cursors"""
+        cursor = None
+        while True:
+            kwargs = dict(query, page_size=min(page_size, NOTION_MAX_PAGE_SIZE))
+            if cursor:
+                kwargs['start_cursor'] = cursor
+            response = await self.query_database(database_id, **kwargs)
+            for page in response.get('results', []):
+                yield page
+
+            cursor = response.get('next_cursor')
+            if not response.get('has_more') or not cursor:
+                break
@@ -0,0 +1,183 @@
+"""Single entry point for the task tools.
+
+    python cli.py eisenhower [--plain] [--format text|markdown|json|ndjson] [--due-within DAYS]
+    python cli.py maslow [--format ...] [--due-within DAYS]
+    python cli.py next [-n N] [--level LEVEL] [--energy LEVEL] [--due-within DAYS] [--format ...]
+    python cli.py enrich [--database ID] [--concurrency N] [--batch-size N] [--write-concurrency N]
+                         [--reuse-labels [--threshold T]]
+    python cli.py duplicates [--database ID] [--threshold T] [--format text|json]
+    python cli.py recommend [--mock] [--stream] [TASK ...]
+    python cli.py serve
+
+Each subcommand imports its module (and through it notion_client, openai,
+httpx, numpy) only when it runs, and the modules build their clients on
+first use, so `recommend --mock` with tasks given on the command line
+starts without loading any SDK. All subcommands accept --profile and
+--metrics (see metrics.py).
+"""
+import argparse
+import sys
+from contextlib import redirect_stdout
+
+from metrics import add_arguments, run_main
+from renderers import FORMATS
+
+
+def cmd_eisenhower(args):
+    if args.plain:
+        import eisenhower_manager as module
+    else:
+        import enhanced_eisenhower as module
+    if args.format == 'text':
+        return module.main(args.due_within)
+    manager = module.EnhancedTaskManager()
+    # Progress messages go to stderr so stdout holds only the report
+    with redirect_stdout(sys.stderr):
+        matrix = manager.categorize_eisenhower(manager.fetch_tasks(args.due_within))
+    manager.write_recommendations(matrix, sys.stdout, args.format)
+
+
+def cmd_maslow(args):
+    import enhanced_manager
+    if args.format == 'text':
+        return enhanced_manager.main(args.due_within)
+    from task_mirror import TaskMirror
+    manager = enhanced_manager.EnhancedTaskManager(mirror=TaskMirror.from_env())
+    with redirect_stdout(sys.stderr):
+        tasks = manager.fetch_table(args.due_within)
+    manager.write_recommendations(tasks, sys.stdout, args.format)
+
+
+def cmd_next(args):
+    import enhanced_manager
+    from task_mirror import TaskMirror
+    filters = {}
+    if args.level:
+        filters['maslow_level'] = args.level
+    if args.energy:
+        filters['energy'] = args.energy
+    manager = enhanced_manager.EnhancedTaskManager(mirror=TaskMirror.from_env())
+    with redirect_stdout(sys.stderr):
+        tasks = manager.next_tasks(args.n, filters, args.due_within)
+    manager.write_next(tasks, sys.stdout, args.format)
+
+
+def cmd_enrich(args):
+    import task_recommendations
+    task_recommendations.main(
+        database_id=args.database,
+        concurrency=args.concurrency or task_recommendations.MAX_CONCURRENT_TASKS,
+        batch_size=args.batch_size or task_recommendations.GPT_BATCH_SIZE,
+        write_concurrency=args.write_concurrency or task_recommendations.WRITE_CONCURRENCY,
+        reuse_labels=args.reuse_labels or task_recommendations.REUSE_DUPLICATE_LABELS,
+        threshold=args.threshold
+    )
+
+
+def cmd_duplicates(args):
+    import task_recommendations
+    task_recommendations.report_duplicates(args.database, args.threshold, args.format)
+
+
+def cmd_recommend(args):
+    from assistant_manager import AssistantManager
+    tasks = args.tasks
+    if not tasks:
+        from task_manager import TaskManager
+        print("\nFetching your tasks from Notion...")
+        tasks = TaskManager().fetch_tasks()
+        if not tasks:
+            print("\nNo tasks found in the database.")
+            return
+
+    if args.mock:
+        print(AssistantManager().get_mock_recommendation(tasks))
+        return
+    from llm_cache import LLMCache
+    manager = AssistantManager(cache=LLMCache.from_env())
+    if not args.stream:
+        print(manager.get_gpt_recommendation(tasks))
+        return
+    from assistant import print_stream
+    try:
+        stream = manager.stream_gpt_recommendation(tasks)
+    except Exception as e:
+        print(f"Error getting recommendation: {str(e)}")
+        return
+    print_stream(stream)
+
+
+def cmd_serve(args):
+    import task_daemon
+    task_daemon.main()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Notion task assistant")
+    add_arguments(parser)
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    commands.required = True
+
+    eisenhower = commands.add_parser('eisenhower', help="Eisenhower matrix of open tasks")
+    eisenhower.add_argument('--plain', action='store_true',
+                            help="Use the Importance/Urgency properties only, no keyword suggestions")
+    eisenhower.add_argument('--format', choices=FORMATS, default='text')
+    eisenhower.add_argument('--due-within', type=int, metavar='DAYS',
+                            help="Only tasks due within DAYS days (overdue included)")
+    eisenhower.set_defaults(func=cmd_eisenhower)
+
+    maslow = commands.add_parser('maslow', help="Recommendations grouped by Maslow level")
+    maslow.add_argument('--format', choices=FORMATS, default='text')
+    maslow.add_argument('--due-within', type=int, metavar='DAYS',
+                        help="Only tasks due within DAYS days (overdue included)")
+    maslow.set_defaults(func=cmd_maslow)
+
+    next_up = commands.add_parser('next', help="The highest-priority tasks to work on next")
+    next_up.add_argument('-n', type=int, default=5, help="How many tasks (default 5)")
+    next_up.add_argument('--level', action='append', metavar='LEVEL',
+                         help="Only tasks in this Maslow level (repeatable)")
+    next_up.add_argument('--energy', action='append', metavar='LEVEL',
+                         help="Only tasks needing this energy, e.g. Low (repeatable)")
+    next_up.add_argument('--due-within', type=int, metavar='DAYS',
+                         help="Only tasks due within DAYS days (overdue included)")
+    next_up.add_argument('--format', choices=FORMATS, default='text')
+    next_up.set_defaults(func=cmd_next)
+
+    enrich = commands.add_parser('enrich', help="Fill in missing Impact/Energy with GPT")
+    enrich.add_argument('--database', help="Tasks database id (default NOTION_DATABASE_ID)")
+    enrich.add_argument('--concurrency', type=int, help="GPT batches in flight")
+    enrich.add_argument('--batch-size', type=int, help="Tasks per GPT request")
+    enrich.add_argument('--write-concurrency', type=int, help="Notion page updates in flight")
+    enrich.add_argument('--reuse-labels', action='store_true',
+                        help="Copy Impact/Energy from a labeled near-duplicate task instead of asking GPT")
+    enrich.add_argument('--threshold', type=float,
+                        help="Name similarity (Jaccard, 0-1) needed to reuse labels "
+                             "(default DUPLICATE_THRESHOLD or 0.8)")
+    enrich.set_defaults(func=cmd_enrich)
+
+    duplicates = commands.add_parser('duplicates', help="Clusters of open tasks with near-duplicate names")
+    duplicates.add_argument('--database', help="Tasks database id (default NOTION_DATABASE_ID)")
+    duplicates.add_argument('--threshold', type=float,
+                            help="Name similarity (Jaccard, 0-1) that counts as a duplicate "
+                                 "(default DUPLICATE_THRESHOLD or 0.8)")
+    duplicates.add_argument('--format', choices=('text', 'json'), default='text')
+    duplicates.set_defaults(func=cmd_duplicates)
+
+    recommend = commands.add_parser('recommend', help="Prioritization advice for a list of tasks")
+    recommend.add_argument('--mock', action='store_true', help="Canned answer, no OpenAI request")
+    recommend.add_argument('--stream', action='store_true',
+                           help="Print the answer as it is generated, then time to first token")
+    recommend.add_argument('tasks', nargs='*', metavar='TASK', help="Task names (default: read from Notion)")
+    recommend.set_defaults(func=cmd_recommend)
+
+    serve = commands.add_parser('serve', help="Run the polling report server (see task_daemon.py)")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return run_main(lambda: args.func(args), args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Construction of the Notion and OpenAI clients.
+
+Every script builds its clients through these helpers so that the API
+endpoints can be redirected with configuration alone:
+
+- NOTION_BASE_URL (default https://api.notion.com), e.g. the local fake
+  from fake_services.py: http://127.0.0.1:8700
+- OPENAI_BASE_URL (default https://api.openai.com/v1), e.g.
+  http://127.0.0.1:8700/v1
+
+All of them share the keep-alive connection pool from http_pool.py, and
+their HTTP clients carry the event hooks from metrics.py, so every API
+call is counted and timed.
+"""
+import os
+
+from metrics import async_httpx_event_hooks, httpx_event_hooks
+
+NOTION_API_URL = 'https://api.notion.com'
+NOTION_VERSION = '2022-06-28'
+
+# Default read timeouts in seconds (the SDK defaults); HTTP_TIMEOUT overrides both
+NOTION_TIMEOUT = 60
+OPENAI_TIMEOUT = 600
+
+
+def notion_base_url():
+    """Root URL of the Notion API (without /v1)"""
+    return (os.getenv('NOTION_BASE_URL') or NOTION_API_URL).rstrip('/')
+
+
+def openai_base_url():
+    """Base URL for OpenAI requests, or None for the SDK default"""
+    return os.getenv('OPENAI_BASE_URL') or None
+
+
+def notion_options(auth=None):
+    """Keyword arguments for notion_client.Client / AsyncClient"""
+    return {'auth': auth or os.getenv('NOTION_API_KEY'), 'base_url': notion_base_url()}
+
+
+def notion_client(auth=None):
+    """A synchronous Notion client on the shared connection pool"""
+    import httpx
+    import http_pool
+    from notion_client import Client
+    notion = Client(
+        client=httpx.Client(transport=http_pool.get_transport(), event_hooks=httpx_event_hooks('notion')),
+        **notion_options(auth)
+    )
+    # The SDK sets one timeout for everything; keep a short connect timeout
+    notion.client.timeout = http_pool.timeout(NOTION_TIMEOUT)
+    return notion
+
+
+def async_notion_client(auth=None):
+    """An asyncio Notion client on the running loop's shared connection pool"""
+    import httpx
+    import http_pool
+    from notion_client import AsyncClient
+    notion = AsyncClient(
+        client=httpx.AsyncClient(transport=http_pool.get_async_transport(),
+                                 event_hooks=async_httpx_event_hooks('notion')),
+        **notion_options(auth)
+    )
+    notion.client.timeout = http_pool.timeout(NOTION_TIMEOUT)
+    return notion
+
+
+def openai_client(api_key=None):
+    """An `openai.OpenAI` client on the shared connection pool"""
+    import httpx
+    import http_pool
+    from openai import OpenAI
+    return OpenAI(
+        api_key=api_key or os.getenv('OPENAI_API_KEY'),
+        base_url=openai_base_url(),
+        timeout=http_pool.timeout(OPENAI_TIMEOUT),
+        # The SDK accepts a plain httpx.Client, which lets it share the Notion pool
+        http_client=httpx.Client(transport=http_pool.get_transport(), follow_redirects=True,
+                                 event_hooks=httpx_event_hooks('openai'))
+    )
+
+
+def notion_http_client(auth=None):
+    """
+    A plain `httpx.Client` for raw Notion API calls, on the shared pool.
+
+    Paths are relative to /v1/, e.g. `notion_http_client().post(f'databases/{id}/query', json={})`.
+    """
+    import httpx
+    import http_pool
+    return httpx.Client(
+        base_url=f"{notion_base_url()}/v1/",
+        headers=notion_headers(auth),
+        timeout=http_pool.timeout(NOTION_TIMEOUT),
+        transport=http_pool.get_transport(),
+        event_hooks=httpx_event_hooks('notion')
+    )
+
+
+def notion_headers(auth=None):
+    """Headers for raw HTTP requests to the Notion API"""
+    return {
+        "Authorization": f"Bearer {auth or os.getenv('NOTION_API_KEY')}",
+        "Content-Type": "application/json",
+        "Notion-Version": NOTION_VERSION
+    }
+
+
+def notion_url(path):
+    """Full URL of a Notion API endpoint, e.g. notion_url(f'databases/{id}/query')"""
+    return f"{notion_base_url()}/v1/{path.lstrip('/')}"
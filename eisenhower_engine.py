@@ -0,0 +1,130 @@
+"""NumPy classification engine for Eisenhower quadrants and due-date urgency.
+
+Works on a `TaskTable` instead of one task dict at a time:
+
+- importance/urgency codes are mapped to booleans through a per-vocabulary
+  lookup table, so the 'high'/'important'/'yes' check runs once per
+  distinct label rather than once per task;
+- days until due are computed for the whole batch against a single "now",
+  with the same floor semantics as `(due - datetime.now()).days`;
+- quadrants (and Maslow level x quadrant buckets) come out of array ops.
+
+Results are identical to the per-task logic in the task managers.
+"""
+from datetime import date, datetime
+
+import numpy as np
+
+from task_model import IMPORTANT_VALUES, URGENT_VALUES, QUADRANTS, NO_DUE_DATE
+
+URGENCY_LEVELS = ('high', 'medium', 'low')
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_US_PER_DAY = 24 * 60 * 60 * 1000000
+
+
+def _codes(table, field):
+    if not len(table):
+        return np.zeros(0, dtype=np.uint16)
+    return np.frombuffer(table.columns[field], dtype=np.uint16)
+
+
+def _flags(table, field, truthy_values, default):
+    lookup = np.array(table.vocabularies[field].flags(truthy_values, default), dtype=bool)
+    return lookup[_codes(table, field)]
+
+
+def days_until_due(due_ordinals, now=None):
+    """
+    Whole days from `now` until each due date (midnight), floored.
+
+    Matches `(datetime.strptime(due, '%Y-%m-%d') - now).days` per element.
+    Rows without a due date get a large positive value.
+    """
+    now = np.datetime64(now or datetime.now(), 'us').astype(np.int64)
+    ordinals = np.asarray(due_ordinals, dtype=np.int64)
+    due_us = (ordinals - _EPOCH_ORDINAL) * _US_PER_DAY
+    days = np.floor_divide(due_us - now, _US_PER_DAY)
+    return np.where(ordinals == NO_DUE_DATE, np.iinfo(np.int64).max, days)
+
+
+def urgency_codes(due_ordinals, now=None):
+    """Index into URGENCY_LEVELS for each due date; 'medium' when there is none"""
+    ordinals = np.asarray(due_ordinals, dtype=np.int64)
+    days = days_until_due(ordinals, now)
+    codes = np.where(days <= 3, 0, np.where(days <= 7, 1, 2)).astype(np.uint8)
+    codes[ordinals == NO_DUE_DATE] = 1
+    return codes
+
+
+def fill_urgency(table, now=None):
+    """
+    Derive urgency from the due date for rows that have a due date but no urgency.
+
+    This is the batch form of calling `calculate_urgency` on each task;
+    unparseable due dates become 'medium' just as they do there.
+    """
+    if not len(table):
+        return
+    vocabulary = table.vocabularies['urgency']
+    level_codes = np.array([vocabulary.encode(level) for level in URGENCY_LEVELS], dtype=np.uint16)
+    has_due_date = np.fromiter((bool(due) for due in table.due_dates), dtype=bool, count=len(table))
+
+    urgency = _codes(table, 'urgency')
+    missing = (urgency == 0) & has_due_date
+    derived = urgency_codes(np.frombuffer(table.due, dtype=f'i{table.due.itemsize}'), now)
+    urgency[missing] = level_codes[derived[missing]]
+
+
+def quadrant_codes(table, default_importance=None, default_urgency=None):
+    """Index into QUADRANTS for every row of a TaskTable"""
+    important = _flags(table, 'importance', IMPORTANT_VALUES, default_importance)
+    urgent = _flags(table, 'urgency', URGENT_VALUES, default_urgency)
+    return ((~urgent).astype(np.uint8) + 2 * (~important).astype(np.uint8))
+
+
+def quadrant_rows(table, default_importance=None, default_urgency=None):
+    """Row indices per quadrant, in table order"""
+    codes = quadrant_codes(table, default_importance, default_urgency)
+    return {quadrant: np.flatnonzero(codes == code) for code, quadrant in enumerate(QUADRANTS)}
+
+
+def maslow_quadrant_buckets(table, default_level='Uncategorized', default_importance=None,
+                            default_urgency=None):
+    """
+    Row indices per Maslow level and quadrant.
+
+    Levels are ordered by first appearance (a task's own levels in order),
+    the same order a per-task pass filling a dict would produce. Tasks in
+    several levels appear under each of them.
+    """
+    quadrants = quadrant_codes(table, default_importance, default_urgency)
+    levels = _codes(table, 'maslow_level')
+    vocabulary = table.vocabularies['maslow_level']
+
+    # rows per level name, and where (row, position) each level first appears
+    level_rows = {}
+    first_seen = {}
+    for code in np.unique(levels):
+        name = vocabulary.decode(code) if code else default_level
+        rows = np.flatnonzero(levels == code)
+        level_rows[name] = np.concatenate([level_rows[name], rows]) if name in level_rows else rows
+        first_seen[name] = min(first_seen.get(name, (len(table), 0)), (int(rows[0]), 0))
+
+    extra_rows = {}
+    for row, row_levels in enumerate(table.extra_levels):
+        for position, name in enumerate(row_levels[1:] if row_levels else (), start=1):
+            extra_rows.setdefault(name, []).append(row)
+            first_seen[name] = min(first_seen.get(name, (len(table), 0)), (row, position))
+    for name, rows in extra_rows.items():
+        rows = np.array(rows, dtype=np.intp)
+        level_rows[name] = np.concatenate([level_rows[name], rows]) if name in level_rows else rows
+
+    buckets = {}
+    for name in sorted(first_seen, key=first_seen.get):
+        rows = np.unique(level_rows[name])
+        row_quadrants = quadrants[rows]
+        buckets[name] = {
+            quadrant: rows[row_quadrants == code] for code, quadrant in enumerate(QUADRANTS)
+        }
+    return buckets
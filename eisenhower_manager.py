@@ -1,48 +1,106 @@
-from notion_client import Client
-from openai import OpenAI
 from dotenv import load_dotenv
+from clients import notion_client
 from datetime import datetime
-import os
+from notion_pagination import iter_parsed
+from notion_schema import compile_extractor
+from notion_query import QueryBuilder
+from task_sources import load_task_databases, merge_streams
+from task_model import Task, TaskTable
+from eisenhower_engine import quadrant_rows
+from renderers import compile_templates, render, render_to_string
+from metrics import CLASSIFY, METRICS, run_main
+import sys
+
+# Where each task field lives; override with NOTION_PROPERTY_MAP
+TASK_PROPERTIES = {
+    'name': {'type': 'title', 'required': True},
+    'due_date': {'type': 'date'},
+    'importance': {'name': 'Importance', 'type': 'select'},
+    'urgency': {'name': 'Urgency', 'type': 'select'},
+}
+
+EISENHOWER_SECTIONS = (
+    ('urgent_important', "🔥 DO FIRST (Urgent & Important)"),
+    ('not_urgent_important', "📅 SCHEDULE (Important, Not Urgent)"),
+    ('urgent_not_important', "👥 DELEGATE (Urgent, Not Important)"),
+    ('not_urgent_not_important', "⚠️ ELIMINATE/MINIMIZE (Not Urgent, Not Important)"),
+)
+RECOMMENDATION_TEMPLATES = compile_templates({'separator': "\n"})
 
 class EnhancedTaskManager:
     def __init__(self):
         load_dotenv()
-        self.notion = Client(auth=os.getenv('NOTION_API_KEY'))
-        self.database_id = os.getenv('NOTION_DATABASE_ID')
+        self._notion = None
+        # NOTION_TASK_DATABASES may list several; the first is the primary one
+        self.task_databases = load_task_databases(TASK_PROPERTIES)
+        self.database_id, self.task_properties = self.task_databases[0]
+        self._extractors = {}
+
+    @property
+    def notion(self):
+        """The Notion client, created on first use"""
+        if self._notion is None:
+            self._notion = notion_client()
+        return self._notion
+
+    def get_extractor(self, database=None):
+        """Compile (once) the property extractor for a task database (the primary one by default)"""
+        database = database or self.task_databases[0]
+        if database.database_id not in self._extractors:
+            self._extractors[database.database_id] = compile_extractor(self.notion, *database)
+        return self._extractors[database.database_id]
         
-    def fetch_tasks(self):
+    def parse_task(self, page, extractor=None):
+        """Extract a Task from a Notion page, or None if it has no name"""
+        fields = (extractor or self.get_extractor()).extract(page)
+        if not fields.get('name'):  # Only keep tasks with a name
+            return None
+        return Task.from_fields(dict(fields, id=page.get('id')))
+
+    def task_query(self, due_within=None, database=None):
+        """The server-side query for tasks: mapped properties only, earliest due first, optionally a due-date window"""
+        query = QueryBuilder(self.get_extractor(database)).sort('due_date').select()
+        if due_within is not None:
+            query.due_within(due_within)
+        return query
+
+    def iter_database_tasks(self, database, due_within=None):
+        """Stream parsed tasks of one database, earliest due first, following pagination cursors"""
+        query = self.task_query(due_within, database)
+        parse = lambda page: self.parse_task(page, query.extractor)
+        yield from iter_parsed(self.notion, database.database_id, parse, **query.build())
+
+    def iter_tasks(self, due_within=None):
+        """Stream parsed tasks of every task database, read concurrently and merged by due date"""
+        self.notion  # Created here, not by the fetch threads that share it
+        return merge_streams(self.iter_database_tasks(database, due_within)
+                             for database in self.task_databases)
+
+    def fetch_tasks(self, due_within=None):
         """Fetch tasks from Notion database"""
         try:
-            response = self.notion.databases.query(
-                database_id=self.database_id
-            )
-            
-            tasks = []
-            for page in response['results']:
-                task = {}
-                # Extract properties
-                for prop_name, prop_data in page['properties'].items():
-                    if prop_data['type'] == 'title' and prop_data['title']:
-                        task['name'] = prop_data['title'][0]['text']['content']
-                    elif prop_data['type'] == 'date' and prop_data.get('date'):
-                        task['due_date'] = prop_data['date']['start']
-                    elif prop_data['type'] == 'select' and prop_data.get('select'):
-                        if prop_name.lower() == 'importance':
-                            task['importance'] = prop_data['select']['name']
-                        elif prop_name.lower() == 'urgency':
-                            task['urgency'] = prop_data['select']['name']
-                
-                if task.get('name'):  # Only add if task has a name
-                    tasks.append(task)
-            
-            return tasks
+            return list(self.iter_tasks(due_within))
         
         except Exception as e:
             print(f"Error fetching tasks: {str(e)}")
             return []
 
+    def fetch_table(self, due_within=None):
+        """Fetch tasks from Notion database into a columnar TaskTable"""
+        try:
+            return TaskTable.from_tasks(self.iter_tasks(due_within))
+        
+        except Exception as e:
+            print(f"Error fetching tasks: {str(e)}")
+            return TaskTable()
+
     def categorize_eisenhower(self, tasks):
         """Categorize tasks using Eisenhower Matrix"""
+        if isinstance(tasks, TaskTable):
+            # Default to medium if not specified
+            rows = quadrant_rows(tasks, default_importance='medium', default_urgency='medium')
+            return {quadrant: [tasks.task(row) for row in indices] for quadrant, indices in rows.items()}
+        
         matrix = {
             'urgent_important': [],      # Do First
             'not_urgent_important': [],  # Schedule
@@ -69,65 +127,41 @@ class EnhancedTaskManager:
                 
         return matrix
 
+    def iter_recommendation_events(self, matrix):
+        """Yield the report events (see renderers) for an Eisenhower matrix"""
+        yield ('report', 'eisenhower', "📊 Task Recommendations (Eisenhower Matrix)")
+        for quadrant, title in EISENHOWER_SECTIONS:
+            yield ('section', quadrant, title)
+            if matrix[quadrant]:
+                for task in matrix[quadrant]:
+                    yield ('task', task)
+            else:
+                yield ('empty', "No tasks in this category")
+            yield ('end_section',)
+
+    def write_recommendations(self, matrix, writer=sys.stdout, fmt='text'):
+        """Stream task recommendations to a writer in one of renderers.FORMATS"""
+        render(self.iter_recommendation_events(matrix), writer, fmt, RECOMMENDATION_TEMPLATES)
+
     def format_recommendations(self, matrix):
         """Format task recommendations based on Eisenhower Matrix"""
-        recommendations = "📊 Task Recommendations (Eisenhower Matrix)\n\n"
-        
-        # Do First (Urgent & Important)
-        recommendations += "🔥 DO FIRST (Urgent & Important):\n"
-        if matrix['urgent_important']:
-            for task in matrix['urgent_important']:
-                due_date = f" (Due: {task['due_date']})" if task.get('due_date') else ""
-                recommendations += f"- {task['name']}{due_date}\n"
-        else:
-            recommendations += "- No tasks in this category\n"
-        recommendations += "\n"
-        
-        # Schedule (Important, Not Urgent)
-        recommendations += "📅 SCHEDULE (Important, Not Urgent):\n"
-        if matrix['not_urgent_important']:
-            for task in matrix['not_urgent_important']:
-                due_date = f" (Due: {task['due_date']})" if task.get('due_date') else ""
-                recommendations += f"- {task['name']}{due_date}\n"
-        else:
-            recommendations += "- No tasks in this category\n"
-        recommendations += "\n"
-        
-        # Delegate (Urgent, Not Important)
-        recommendations += "👥 DELEGATE (Urgent, Not Important):\n"
-        if matrix['urgent_not_important']:
-            for task in matrix['urgent_not_important']:
-                due_date = f" (Due: {task['due_date']})" if task.get('due_date') else ""
-                recommendations += f"- {task['name']}{due_date}\n"
-        else:
-            recommendations += "- No tasks in this category\n"
-        recommendations += "\n"
-        
-        # Eliminate (Not Urgent, Not Important)
-        recommendations += "⚠️ ELIMINATE/MINIMIZE (Not Urgent, Not Important):\n"
-        if matrix['not_urgent_not_important']:
-            for task in matrix['not_urgent_not_important']:
-                due_date = f" (Due: {task['due_date']})" if task.get('due_date') else ""
-                recommendations += f"- {task['name']}{due_date}\n"
-        else:
-            recommendations += "- No tasks in this category\n"
-        
-        return recommendations
+        return render_to_string(self.iter_recommendation_events(matrix), 'text', RECOMMENDATION_TEMPLATES)
 
-def main():
+def main(due_within=None):
     manager = EnhancedTaskManager()
     
     print("\nFetching your tasks from Notion...")
-    tasks = manager.fetch_tasks()
+    tasks = manager.fetch_table(due_within)
     
     if tasks:
         print(f"\nFound {len(tasks)} tasks!")
         print("\nAnalyzing using Eisenhower Matrix...")
-        matrix = manager.categorize_eisenhower(tasks)
+        with METRICS.stage(CLASSIFY):
+            matrix = manager.categorize_eisenhower(tasks)
         recommendations = manager.format_recommendations(matrix)
         print("\n" + recommendations)
     else:
         print("\nNo tasks found in the database.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_main(main)
\ No newline at end of file
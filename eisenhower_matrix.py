@@ -0,0 +1,183 @@
+"""Incrementally maintained Eisenhower matrix.
+
+`categorize_eisenhower` re-classifies every task on each call. For a
+long-running process, `IncrementalMatrix` keeps the four quadrants as
+dicts keyed by page id instead, so adding, updating or removing a task
+touches only that task.
+
+Urgency derived from a due date (see `calculate_urgency`) only changes
+when the due date comes within 7 days and again within 3 days. Each
+such crossing is pushed onto a min-heap of timers; `advance()` pops the
+timers that are due and moves just those tasks, so the clock ticking
+never requires a full re-classification either.
+"""
+import heapq
+import itertools
+from datetime import datetime, timedelta
+
+from task_model import IMPORTANT_VALUES, URGENT_VALUES, QUADRANTS, parse_due_date
+
+# (days until due at or below which the level applies, level), most urgent first
+URGENCY_THRESHOLDS = ((3, 'high'), (7, 'medium'))
+
+_EPSILON = timedelta(microseconds=1)
+
+
+def due_midnight(due_date):
+    """The due date of a task as a naive datetime at midnight, or None"""
+    try:
+        ordinal = parse_due_date(due_date)
+    except ValueError:
+        return None
+    return datetime.fromordinal(ordinal) if ordinal else None
+
+
+def derived_urgency(due, now):
+    """
+    Urgency from a due datetime, and the time it next changes.
+
+    Matches `calculate_urgency`: `(due - now).days` of 3 or less is 'high',
+    7 or less 'medium', anything later 'low'.
+
+    Returns:
+        tuple: (urgency, datetime of the next change or None)
+    """
+    days = (due - now).days
+    level = next((level for threshold, level in URGENCY_THRESHOLDS if days <= threshold), 'low')
+    # (due - now).days drops to `threshold` as soon as due - now < threshold + 1 days
+    upcoming = [threshold for threshold, _ in URGENCY_THRESHOLDS if days > threshold]
+    if not upcoming:
+        return level, None
+    return level, due - timedelta(days=max(upcoming) + 1) + _EPSILON
+
+
+class IncrementalMatrix:
+    def __init__(self, default_importance='medium', default_urgency='medium', clock=datetime.now):
+        """
+        Args:
+            default_importance (str): Importance of tasks that have none
+            default_urgency (str): Urgency of tasks with neither urgency nor due date
+            clock: Returns the current naive datetime
+        """
+        self.default_importance = default_importance
+        self.default_urgency = default_urgency
+        self.clock = clock
+        self.quadrants = {quadrant: {} for quadrant in QUADRANTS}
+        self._where = {}
+        self._order = {}
+        self._derived = {}
+        self._generation = {}
+        self._timers = []
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, page_id):
+        return page_id in self._where
+
+    def _quadrant(self, task):
+        importance = (task.get('importance') or self.default_importance or '').lower()
+        urgency = (task.get('urgency') or self.default_urgency or '').lower()
+        is_important = importance in IMPORTANT_VALUES
+        is_urgent = urgency in URGENT_VALUES
+        return QUADRANTS[(not is_urgent) + 2 * (not is_important)]
+
+    def _place(self, page_id, task):
+        quadrant = self._quadrant(task)
+        previous = self._where.get(page_id)
+        if previous != quadrant:
+            if previous is not None:
+                del self.quadrants[previous][page_id]
+            self._where[page_id] = quadrant
+        self.quadrants[quadrant][page_id] = task
+        return previous, quadrant
+
+    def _derive(self, page_id, task, now, generation):
+        """Fill in urgency from the due date and schedule its next change"""
+        due = due_midnight(task.get('due_date'))
+        if due is None:
+            # calculate_urgency treats an unparseable due date as 'medium'
+            task['urgency'] = 'medium' if task.get('due_date') else None
+            return
+        urgency, changes_at = derived_urgency(due, now)
+        task['urgency'] = urgency
+        if changes_at is not None:
+            heapq.heappush(self._timers, (changes_at, next(self._sequence), page_id, generation))
+
+    def upsert(self, task, now=None):
+        """
+        Add or replace a task (keyed by its id) and return its quadrant.
+
+        A task without urgency gets one derived from its due date; the task
+        record is updated in place whenever that derived urgency changes.
+        """
+        page_id = task.get('id')
+        quadrant = self._where.get(page_id)
+        # Re-adding the stored record must not mistake our derived urgency for a set one
+        derived = not task.get('urgency') or (
+            quadrant is not None and self.quadrants[quadrant][page_id] is task and self._derived[page_id]
+        )
+        generation = self._generation.get(page_id, 0) + 1
+        self._generation[page_id] = generation
+        self._order.setdefault(page_id, next(self._sequence))
+
+        self._derived[page_id] = derived
+        if derived:
+            self._derive(page_id, task, now or self.clock(), generation)
+        return self._place(page_id, task)[1]
+
+    def remove(self, page_id):
+        """Drop a task; returns whether it was present"""
+        quadrant = self._where.pop(page_id, None)
+        if quadrant is None:
+            return False
+        del self.quadrants[quadrant][page_id]
+        del self._order[page_id]
+        del self._derived[page_id]
+        # Pending timers for this page become stale
+        self._generation[page_id] = self._generation.get(page_id, 0) + 1
+        return True
+
+    def _drop_stale_timers(self):
+        while self._timers:
+            _, _, page_id, generation = self._timers[0]
+            if page_id in self._where and self._generation.get(page_id) == generation:
+                return
+            heapq.heappop(self._timers)
+
+    def next_transition(self):
+        """When the next due-date threshold is crossed, or None"""
+        self._drop_stale_timers()
+        return self._timers[0][0] if self._timers else None
+
+    def advance(self, now=None):
+        """
+        Apply every threshold crossing up to `now`.
+
+        Returns:
+            list: (page_id, old quadrant, new quadrant) for every task whose
+            urgency changed; the quadrants are equal if it didn't move
+        """
+        now = now or self.clock()
+        moved = []
+        while True:
+            self._drop_stale_timers()
+            if not self._timers or self._timers[0][0] > now:
+                return moved
+            _, _, page_id, generation = heapq.heappop(self._timers)
+            quadrant = self._where[page_id]
+            task = self.quadrants[quadrant][page_id]
+            self._derive(page_id, task, now, generation)
+            moved.append((page_id,) + self._place(page_id, task))
+
+    def matrix(self):
+        """Quadrant -> tasks, each in the order tasks were first added"""
+        order = self._order
+        return {
+            quadrant: [task for _, task in sorted(tasks.items(), key=lambda item: order[item[0]])]
+            for quadrant, tasks in self.quadrants.items()
+        }
+
+    def counts(self):
+        return {quadrant: len(tasks) for quadrant, tasks in self.quadrants.items()}
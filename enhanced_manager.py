@@ -1,16 +1,106 @@
-from notion_client import Client
-from openai import OpenAI
 from dotenv import load_dotenv
+from clients import notion_client
 from datetime import datetime, timedelta
 from collections import defaultdict
+from notion_pagination import iter_query_results
+from task_mirror import TaskMirror
+from notion_schema import compile_extractor, load_property_map
+from notion_query import QueryBuilder
+from task_sources import due_date_key, load_task_databases, merge_streams
+from task_model import Task, TaskTable
+from eisenhower_engine import fill_urgency, maslow_quadrant_buckets
+from priority import PriorityModel, top_k
+from area_index import AreaIndex, DEFAULT_TTL as AREA_INDEX_TTL, resolve_areas
+from renderers import compile_templates, render, render_to_string
+from metrics import AREA_LOOKUP, CLASSIFY, FETCH, METRICS, PARSE, run_main
 import os
+import sys
+
+# Where each task/area field lives; override with NOTION_PROPERTY_MAP / NOTION_AREA_PROPERTY_MAP
+TASK_PROPERTIES = {
+    'name': {'name': 'Task', 'type': 'title', 'required': True},
+    'due_date': {'type': 'date'},
+    'importance': {'name': 'Importance', 'type': 'select'},
+    'urgency': {'name': 'Urgency', 'type': 'select'},
+    'impact': {'name': 'Impact', 'type': 'select'},
+    'energy': {'name': 'Energy Required', 'type': 'select'},
+    'areas': {'name': 'Areas', 'type': 'relation'},
+    'status': {'name': 'Status', 'type': ['status', 'select']},
+}
+AREA_PROPERTIES = {
+    'name': {'name': 'Name', 'type': 'title', 'required': True},
+    'maslow_level': {'name': 'Maslow Level', 'type': 'select'},
+}
+
+RECOMMENDATION_TEMPLATES = compile_templates({
+    'report': "{title}\n\n",
+    'section': "\n== {title} ==\n",
+    'area': " [{area}]",
+})
 
 class EnhancedTaskManager:
-    def __init__(self):
+    def __init__(self, mirror=None, verbose=False):
         load_dotenv()
-        self.notion = Client(auth=os.getenv('NOTION_API_KEY'))
-        self.database_id = os.getenv('NOTION_DATABASE_ID')
+        self._notion = None
         self.areas_database_id = os.getenv('NOTION_AREAS_DATABASE_ID')
+        self.mirror = mirror
+        # NOTION_TASK_DATABASES may list several; the first is the primary one
+        self.task_databases = load_task_databases(TASK_PROPERTIES)
+        self.database_id, self.task_properties = self.task_databases[0]
+        self.area_properties = load_property_map(AREA_PROPERTIES, 'NOTION_AREA_PROPERTY_MAP')
+        self._extractors = {}
+        self.verbose = verbose
+        self._area_index = None
+        self.priority = PriorityModel.from_env()
+
+    @property
+    def notion(self):
+        """The Notion client, created on first use"""
+        if self._notion is None:
+            self._notion = notion_client()
+        return self._notion
+
+    @property
+    def area_index(self):
+        """The cached Areas lookup (see AreaIndex), created on first use"""
+        if self._area_index is None:
+            self._area_index = AreaIndex(
+                self.notion,
+                self.areas_database_id,
+                self.area_properties,
+                ttl=float(os.getenv('AREA_INDEX_TTL', AREA_INDEX_TTL)),
+                path=os.getenv('AREA_INDEX_PATH'),
+                mirror=self.mirror,
+                verbose=self.verbose
+            )
+        return self._area_index
+
+    def get_extractor(self, database_id, property_map):
+        """Compile (once) the property extractor for a database"""
+        if database_id not in self._extractors:
+            self._extractors[database_id] = compile_extractor(self.notion, database_id, property_map)
+        return self._extractors[database_id]
+
+    def iter_database_pages(self, database_id, query=None):
+        """Stream pages of a database matching a QueryBuilder, from the local mirror after a delta sync if one is set"""
+        if self.mirror is None:
+            return iter_query_results(self.notion, database_id, **(query.build() if query else {}))
+        
+        with METRICS.stage(FETCH):
+            self.mirror.sync(self.notion, database_id)
+        pages = self.mirror.iter_pages(database_id)
+        if query is None:
+            return pages
+        # The mirror holds every page with every property, so apply the filter locally
+        return (page for page in pages if query.matches(query.extractor.extract(page)))
+
+    def task_query(self, due_within=None, database=None):
+        """The server-side query for open tasks, earliest due first, optionally within a due-date window"""
+        query = QueryBuilder(self.get_extractor(*(database or self.task_databases[0])))
+        query.exclude('status', 'Completed').sort('due_date').select()
+        if due_within is not None:
+            query.due_within(due_within)
+        return query
 
     def calculate_urgency(self, due_date):
         """Calculate urgency based on due date"""
@@ -34,94 +124,105 @@ class EnhancedTaskManager:
             return "medium"
 
     def get_area_maslow_levels(self):
-        """Fetch all areas and their Maslow levels"""
+        """Fetch all areas and their Maslow levels (cached, see AreaIndex)"""
         try:
-            response = self.notion.databases.query(database_id=self.areas_database_id)
-            area_levels = {}
-            
-            for page in response['results']:
-                area_id = page['id']
-                try:
-                    area_name = page['properties']['Name']['title'][0]['text']['content']
-                except:
-                    print(f"Warning: Could not get name for area {area_id}")
-                    continue
-                
-                try:
-                    maslow_prop = page['properties'].get('Maslow Level', {})
-                    maslow_level = maslow_prop.get('select', {}).get('name', 'Uncategorized')
-                except:
-                    print(f"Warning: Could not get Maslow level for area {area_name}")
-                    maslow_level = 'Uncategorized'
-                
-                area_levels[area_id] = {'name': area_name, 'level': maslow_level}
-                print(f"Mapped area: {area_name} -> {maslow_level}")
-            
-            return area_levels
+            with METRICS.stage(AREA_LOOKUP):
+                return self.area_index.load()
         except Exception as e:
             print(f"Error fetching areas: {str(e)}")
             return {}
 
-    def fetch_tasks(self):
-        """Fetch tasks from Notion database"""
+    def parse_task(self, page, area_levels, derive_urgency=True, extractor=None):
+        """Extract a Task from a Notion page, or None if it has no name"""
         try:
-            response = self.notion.databases.query(
-                database_id=self.database_id,
-                filter={
-                    "property": "Status",
-                    "status": {
-                        "does_not_equal": "Completed"
-                    }
-                }
-            )
+            extractor = extractor or self.get_extractor(self.database_id, self.task_properties)
+            fields = extractor.extract(page)
+            if not fields.get('name'):
+                return None
             
-            area_levels = self.get_area_maslow_levels()
-            print(f"Found {len(area_levels)} areas with Maslow levels")
-            tasks = []
-            
-            for page in response['results']:
-                task = {}
-                try:
-                    for prop_name, prop_data in page['properties'].items():
-                        if prop_data['type'] == 'title' and prop_name == 'Task':
-                            title = prop_data.get('title', [])
-                            if title:
-                                task['name'] = title[0]['text']['content']
-                        elif prop_data['type'] == 'date' and prop_data.get('date'):
-                            task['due_date'] = prop_data['date']['start']
-                        elif prop_data['type'] == 'select' and prop_data.get('select'):
-                            if prop_name.lower() == 'importance':
-                                task['importance'] = prop_data['select']['name']
-                            elif prop_name.lower() == 'urgency':
-                                task['urgency'] = prop_data['select']['name']
-                        elif prop_data['type'] == 'relation' and prop_name == 'Areas':
-                            area_ids = [rel['id'] for rel in prop_data['relation']]
-                            if area_ids:
-                                area_info = area_levels.get(area_ids[0], {})
-                                task['area'] = area_info.get('name', 'Uncategorized')
-                                task['maslow_level'] = area_info.get('level', 'Uncategorized')
-                
-                    if task.get('name'):
-                        if not task.get('urgency') and task.get('due_date'):
-                            task['urgency'] = self.calculate_urgency(task['due_date'])
-                        tasks.append(task)
-                except Exception as e:
-                    print(f"Error processing task: {str(e)}")
-                    continue
+            task = Task(
+                fields['name'],
+                id=page.get('id'),
+                due_date=fields.get('due_date'),
+                importance=fields.get('importance'),
+                urgency=fields.get('urgency'),
+                impact=fields.get('impact'),
+                energy=fields.get('energy')
+            )
+            area_ids = fields.get('areas')
+            if area_ids:
+                names, levels = resolve_areas(area_levels, area_ids)
+                task['area'] = ', '.join(names)
+                task['maslow_level'] = levels[0]
+                task['maslow_levels'] = levels
             
-            return tasks
+            if derive_urgency and not task.get('urgency') and task.get('due_date'):
+                task['urgency'] = self.calculate_urgency(task['due_date'])
+            return task
+        except Exception as e:
+            print(f"Error processing task: {str(e)}")
+        return None
+
+    def iter_database_tasks(self, database, area_levels, derive_urgency=True, due_within=None):
+        """Stream parsed tasks of one database, earliest due first"""
+        query = self.task_query(due_within, database)
+        pages = self.iter_database_pages(database.database_id, query)
+        tasks = self._parse_pages(METRICS.timed_iter(pages, FETCH), area_levels, derive_urgency, query.extractor)
+        if self.mirror is not None:
+            # Mirrored pages come in page id order; they are local, so sort them here
+            tasks = sorted(tasks, key=due_date_key)
+        yield from tasks
+
+    def _parse_pages(self, pages, area_levels, derive_urgency, extractor):
+        for page in pages:
+            with METRICS.stage(PARSE):
+                task = self.parse_task(page, area_levels, derive_urgency, extractor)
+            if task is not None:
+                yield task
+
+    def iter_tasks(self, derive_urgency=True, due_within=None):
+        """Stream parsed tasks of every task database, read concurrently and merged by due date"""
+        # Compile the primary schema first so a mismatched property map fails before any paging
+        self.task_query()
+        area_levels = self.get_area_maslow_levels()
+        print(f"Found {len(area_levels)} areas with Maslow levels")
+        
+        return merge_streams(
+            self.iter_database_tasks(database, area_levels, derive_urgency, due_within)
+            for database in self.task_databases
+        )
+
+    def fetch_tasks(self, due_within=None):
+        """Fetch tasks from Notion database"""
+        try:
+            return list(self.iter_tasks(due_within=due_within))
         except Exception as e:
             print(f"Error fetching tasks: {str(e)}")
             return []
 
+    def fetch_table(self, due_within=None):
+        """Fetch tasks from Notion database into a columnar TaskTable"""
+        try:
+            # Urgency from due dates is derived for the whole table at once
+            table = TaskTable.from_tasks(self.iter_tasks(derive_urgency=False, due_within=due_within))
+            with METRICS.stage(CLASSIFY):
+                fill_urgency(table)
+            return table
+        except Exception as e:
+            print(f"Error fetching tasks: {str(e)}")
+            return TaskTable()
+
     def analyze_task_distribution(self, tasks):
         """Analyze task distribution across Maslow levels"""
-        distribution = defaultdict(int)
         total_tasks = len(tasks)
         
-        for task in tasks:
-            level = task.get('maslow_level', 'Uncategorized')
-            distribution[level] += 1
+        if isinstance(tasks, TaskTable):
+            distribution = tasks.level_counts()
+        else:
+            distribution = defaultdict(int)
+            for task in tasks:
+                for level in task.get('maslow_levels') or (task.get('maslow_level', 'Uncategorized'),):
+                    distribution[level] += 1
         
         analysis = "\n📊 Task Distribution Analysis:\n"
         
@@ -131,61 +232,94 @@ class EnhancedTaskManager:
         
         return analysis
 
-    def generate_recommendations(self, tasks):
-        """Generate prioritized task recommendations"""
-        maslow_tasks = defaultdict(lambda: defaultdict(list))
-        
-        for task in tasks:
-            level = task.get('maslow_level', 'Uncategorized')
-            is_important = task.get('importance', '').lower() in ['high', 'important', 'yes']
-            is_urgent = task.get('urgency', '').lower() in ['high', 'urgent', 'yes']
-            
-            if is_important and is_urgent:
-                quadrant = 'urgent_important'
-            elif is_important:
-                quadrant = 'not_urgent_important'
-            elif is_urgent:
-                quadrant = 'urgent_not_important'
+    def bucket_tasks(self, tasks):
+        """Bucket tasks (a TaskTable or a list) by Maslow level and quadrant"""
+        with METRICS.stage(CLASSIFY):
+            maslow_tasks = defaultdict(lambda: defaultdict(list))
+
+            if isinstance(tasks, TaskTable):
+                for level, quadrants in maslow_quadrant_buckets(tasks).items():
+                    for quadrant, rows in quadrants.items():
+                        maslow_tasks[level][quadrant] = [tasks.task(row) for row in rows]
             else:
-                quadrant = 'not_urgent_not_important'
-                
-            maslow_tasks[level][quadrant].append(task)
-        
-        recommendations = "🎯 Task Recommendations by Development Area\n\n"
-        
+                for task in tasks:
+                    levels = task.get('maslow_levels') or (task.get('maslow_level', 'Uncategorized'),)
+                    is_important = task.get('importance', '').lower() in ['high', 'important', 'yes']
+                    is_urgent = task.get('urgency', '').lower() in ['high', 'urgent', 'yes']
+
+                    if is_important and is_urgent:
+                        quadrant = 'urgent_important'
+                    elif is_important:
+                        quadrant = 'not_urgent_important'
+                    elif is_urgent:
+                        quadrant = 'urgent_not_important'
+                    else:
+                        quadrant = 'not_urgent_not_important'
+
+                    # Tasks in several areas show up under each of their levels
+                    for level in levels:
+                        maslow_tasks[level][quadrant].append(task)
+
+        return maslow_tasks
+
+    def iter_recommendation_events(self, maslow_tasks):
+        """Yield the report events (see renderers) for tasks bucketed by level and quadrant"""
+        yield ('report', 'maslow', "🎯 Task Recommendations by Development Area")
         for level in maslow_tasks:
-            if any(maslow_tasks[level].values()):
-                recommendations += f"\n== {level} ==\n"
-                
-                if maslow_tasks[level]['urgent_important']:
-                    recommendations += "\n🔥 Do First:\n"
-                    for task in maslow_tasks[level]['urgent_important']:
-                        due = f" (Due: {task['due_date']})" if task.get('due_date') else ""
-                        area = f" [{task.get('area', '')}]" if task.get('area') else ""
-                        recommendations += f"- {task['name']}{area}{due}\n"
-                
-                if maslow_tasks[level]['not_urgent_important']:
-                    recommendations += "\n📅 Schedule:\n"
-                    for task in maslow_tasks[level]['not_urgent_important']:
-                        due = f" (Due: {task['due_date']})" if task.get('due_date') else ""
-                        area = f" [{task.get('area', '')}]" if task.get('area') else ""
-                        recommendations += f"- {task['name']}{area}{due}\n"
-                
-                other_tasks = maslow_tasks[level]['urgent_not_important'] + maslow_tasks[level]['not_urgent_not_important']
-                if other_tasks:
-                    recommendations += "\n📌 Also Consider:\n"
-                    for task in other_tasks[:3]:
-                        due = f" (Due: {task['due_date']})" if task.get('due_date') else ""
-                        area = f" [{task.get('area', '')}]" if task.get('area') else ""
-                        recommendations += f"- {task['name']}{area}{due}\n"
-        
-        return recommendations
+            quadrants = maslow_tasks[level]
+            if not any(quadrants.values()):
+                continue
+            yield ('section', level, level)
+            for group, title, tasks in (
+                ('do_first', "🔥 Do First", quadrants['urgent_important']),
+                ('schedule', "📅 Schedule", quadrants['not_urgent_important']),
+                ('also_consider', "📌 Also Consider",
+                 top_k(quadrants['urgent_not_important'] + quadrants['not_urgent_not_important'], 3,
+                       model=self.priority)),
+            ):
+                if tasks:
+                    yield ('group', group, title)
+                    for task in tasks:
+                        yield ('task', task)
+            yield ('end_section',)
+
+    def write_recommendations(self, tasks, writer=sys.stdout, fmt='text'):
+        """Stream prioritized task recommendations to a writer in one of renderers.FORMATS"""
+        render(self.iter_recommendation_events(self.bucket_tasks(tasks)), writer, fmt, RECOMMENDATION_TEMPLATES)
+
+    def next_tasks(self, n=5, filters=None, due_within=None):
+        """The `n` highest-priority open tasks (see priority.top_k), selected while streaming"""
+        try:
+            return top_k(self.iter_tasks(due_within=due_within), n, filters, self.priority)
+        except Exception as e:
+            print(f"Error fetching tasks: {str(e)}")
+            return []
+
+    def iter_next_events(self, tasks):
+        """Yield the report events for a ranked "what next" list"""
+        yield ('report', 'next', "➡️ What Next")
+        yield ('section', 'next', f"Top {len(tasks)} by priority score")
+        if tasks:
+            for task in tasks:
+                yield ('task', task)
+        else:
+            yield ('empty', "No matching tasks")
+        yield ('end_section',)
+
+    def write_next(self, tasks, writer=sys.stdout, fmt='text'):
+        """Stream a ranked "what next" list to a writer in one of renderers.FORMATS"""
+        render(self.iter_next_events(tasks), writer, fmt, RECOMMENDATION_TEMPLATES)
+
+    def generate_recommendations(self, tasks):
+        """Generate prioritized task recommendations"""
+        return render_to_string(self.iter_recommendation_events(self.bucket_tasks(tasks)), 'text', RECOMMENDATION_TEMPLATES)
 
-def main():
-    manager = EnhancedTaskManager()
+def main(due_within=None):
+    load_dotenv()
+    manager = EnhancedTaskManager(mirror=TaskMirror.from_env())
     
     print("\nFetching your tasks from Notion...")
-    tasks = manager.fetch_tasks()
+    tasks = manager.fetch_table(due_within)
     
     if tasks:
         print(f"\nFound {len(tasks)} active tasks!")
@@ -200,4 +334,4 @@ def main():
         print("\nNo active tasks found in the database.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_main(main)
\ No newline at end of file
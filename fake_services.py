@@ -0,0 +1,571 @@
+"""Local stand-ins for the Notion and OpenAI APIs.
+
+One HTTP server answers the subset of both APIs this project uses, with
+a generated (seeded, reproducible) workspace of Tasks and Areas:
+
+    POST  /v1/databases/{id}/query     paginated; filter, sorts, filter_properties
+    GET   /v1/databases/{id}
+    PATCH /v1/pages/{id}
+    POST  /v1/chat/completions         answers task_analysis batches with valid JSON;
+                                       streams server-sent events when `stream` is set
+    GET   /_stats                      request counts per route and status
+
+Each API has its own fault injection: fixed latency plus jitter, a token
+bucket that answers 429 with Retry-After once it is exhausted, and a
+random error rate (500s). Point the clients at it with
+
+    NOTION_BASE_URL=http://127.0.0.1:8700
+    OPENAI_BASE_URL=http://127.0.0.1:8700/v1
+
+and run `python fake_services.py --tasks 2000 --notion-rate 3`. The ids of
+the generated databases are printed on startup. The Tasks title property
+is 'Task'; set NOTION_PROPERTY_MAP='{"name": "Task"}' for
+task_recommendations.py, whose default title is 'Name'.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8700
+
+MASLOW_LEVELS = ('Physiological', 'Safety', 'Love/Belonging', 'Esteem', 'Self-Actualization')
+LEVELS = ('High', 'Medium', 'Low')
+STATUSES = ('Not started', 'In progress', 'Completed')
+TASK_WORDS = ('Plan', 'Review', 'Fix', 'Call', 'Write', 'Install', 'Pay', 'Clean', 'Schedule',
+              'Prepare', 'Update', 'Read', 'Book', 'Urgent', 'Configure', 'Email')
+TASK_OBJECTS = ('budget', 'report', 'dentist', 'car', 'taxes', 'garden', 'backup', 'website',
+                'presentation', 'groceries', 'invoice', 'meeting', 'kitchen', 'deadline')
+
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:00.000Z')
+
+
+def _option(name):
+    return {'id': str(uuid.uuid5(uuid.NAMESPACE_OID, name))[:8], 'name': name, 'color': 'default'}
+
+
+def _title(text):
+    return [{'type': 'text', 'text': {'content': text, 'link': None}, 'plain_text': text,
+             'annotations': {}, 'href': None}]
+
+
+class Faults:
+    """Latency, rate limiting and error injection for one API"""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate=None, burst=None, error_rate=0.0,
+                 retry_after=1, seed=None, stream_delay=0.0):
+        self.latency = latency
+        # Generation time per word: streamed chunks are this far apart, and a
+        # non-streamed completion waits for all of them (latency is time to first token)
+        self.stream_delay = stream_delay
+        self.jitter = jitter
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Sleep for the injected latency, then return None, 'rate_limited' or 'error'"""
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+            limited = False
+            if self.rate:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                else:
+                    limited = True
+        if delay:
+            time.sleep(delay)
+        if limited:
+            return 'rate_limited'
+        return 'error' if failed else None
+
+
+class FakeWorkspace:
+    """Generated Tasks and Areas databases held in memory"""
+
+    def __init__(self, tasks=200, areas=8, seed=0):
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.databases = {}
+        self.pages = {}
+        self.areas_database_id = self._uuid()
+        self.tasks_database_id = self._uuid()
+        self._generate_areas(areas)
+        self._generate_tasks(tasks)
+
+    def _uuid(self):
+        return str(uuid.UUID(int=self._random.getrandbits(128), version=4))
+
+    def _database(self, database_id, title, properties):
+        schema = {}
+        for name, (prop_type, config) in properties.items():
+            prop_id = self._uuid()[:4]
+            schema[name] = {'id': prop_id, 'name': name, 'type': prop_type, prop_type: config}
+        self.databases[database_id] = {
+            'object': 'database', 'id': database_id, 'title': _title(title),
+            'properties': schema, 'pages': []
+        }
+        return schema
+
+    def _add_page(self, database_id, values, edited):
+        schema = self.databases[database_id]['properties']
+        page_id = self._uuid()
+        properties = {}
+        for name, prop in schema.items():
+            value = values.get(name)
+            prop_type = prop['type']
+            if prop_type == 'title':
+                data = _title(value or '')
+            elif prop_type in ('select', 'status'):
+                data = _option(value) if value else None
+            elif prop_type == 'date':
+                data = {'start': value, 'end': None, 'time_zone': None} if value else None
+            elif prop_type == 'relation':
+                data = [{'id': related} for related in value or ()]
+            elif prop_type == 'created_time':
+                data = _timestamp(edited)
+            else:
+                data = value
+            properties[name] = {'id': prop['id'], 'type': prop_type, prop_type: data}
+        page = {
+            'object': 'page', 'id': page_id,
+            'created_time': _timestamp(edited), 'last_edited_time': _timestamp(edited),
+            'archived': False, 'in_trash': False,
+            'parent': {'type': 'database_id', 'database_id': database_id},
+            'properties': properties,
+        }
+        self.pages[page_id] = page
+        self.databases[database_id]['pages'].append(page_id)
+        return page
+
+    def _generate_areas(self, count):
+        self._database(self.areas_database_id, 'Areas', {
+            'Name': ('title', {}),
+            'Maslow Level': ('select', {'options': [_option(level) for level in MASLOW_LEVELS]}),
+        })
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for index in range(count):
+            self._add_page(self.areas_database_id, {
+                'Name': f"Area {index + 1}",
+                'Maslow Level': MASLOW_LEVELS[index % len(MASLOW_LEVELS)],
+            }, start + timedelta(minutes=index))
+
+    def _generate_tasks(self, count):
+        self._database(self.tasks_database_id, 'Tasks', {
+            'Task': ('title', {}),
+            'Status': ('status', {'options': [_option(status) for status in STATUSES]}),
+            'Due': ('date', {}),
+            'Importance': ('select', {'options': [_option(level) for level in LEVELS]}),
+            'Urgency': ('select', {'options': [_option(level) for level in LEVELS]}),
+            'Impact': ('select', {'options': [_option(level) for level in LEVELS]}),
+            'Energy Required': ('select', {'options': [_option(level) for level in LEVELS]}),
+            'Areas': ('relation', {'database_id': self.areas_database_id}),
+            'Project': ('relation', {'database_id': self.areas_database_id}),
+            'Created': ('created_time', {}),
+        })
+        rng = self._random
+        area_ids = list(self.databases[self.areas_database_id]['pages'])
+        start = datetime(2024, 2, 1, tzinfo=timezone.utc)
+        today = datetime.now().date()
+        for index in range(count):
+            maybe = lambda value, chance=0.5: value if rng.random() < chance else None
+            due = maybe((today + timedelta(days=rng.randint(-5, 30))).isoformat(), 0.6)
+            self._add_page(self.tasks_database_id, {
+                'Task': f"{rng.choice(TASK_WORDS)} {rng.choice(TASK_OBJECTS)} #{index + 1}",
+                'Status': rng.choice(STATUSES),
+                'Due': due,
+                'Importance': maybe(rng.choice(LEVELS)),
+                'Urgency': maybe(rng.choice(LEVELS), 0.3),
+                'Impact': maybe(rng.choice(LEVELS)),
+                'Energy Required': maybe(rng.choice(LEVELS)),
+                'Areas': rng.sample(area_ids, rng.randint(0, min(2, len(area_ids)))),
+            }, start + timedelta(minutes=index))
+
+    # -- queries -----------------------------------------------------------
+
+    def _property_value(self, page, name):
+        prop = page['properties'].get(name)
+        if prop is None:
+            return None
+        data = prop.get(prop['type'])
+        if prop['type'] in ('select', 'status'):
+            return data['name'] if data else None
+        if prop['type'] == 'date':
+            return data['start'] if data else None
+        if prop['type'] in ('title', 'rich_text'):
+            return ''.join(fragment['plain_text'] for fragment in data) or None
+        if prop['type'] == 'relation':
+            return [related['id'] for related in data] or None
+        return data
+
+    def _matches(self, page, condition):
+        if 'and' in condition:
+            return all(self._matches(page, part) for part in condition['and'])
+        if 'or' in condition:
+            return any(self._matches(page, part) for part in condition['or'])
+        if 'timestamp' in condition:
+            value = page[condition['timestamp']]
+            ops = condition[condition['timestamp']]
+        else:
+            value = self._property_value(page, condition['property'])
+            ops = next(v for k, v in condition.items() if k != 'property')
+        for op, operand in ops.items():
+            if op == 'equals' and value != operand:
+                return False
+            if op == 'does_not_equal' and value == operand:
+                return False
+            if op == 'is_empty' and value:
+                return False
+            if op == 'is_not_empty' and not value:
+                return False
+            if op == 'contains' and (not value or operand not in value):
+                return False
+            if op in ('before', 'after', 'on_or_before', 'on_or_after'):
+                if value is None:
+                    return False
+                left, right = value[:len(operand)], operand
+                if ((op == 'before' and not left < right) or (op == 'after' and not left > right)
+                        or (op == 'on_or_before' and not left <= right)
+                        or (op == 'on_or_after' and not left >= right)):
+                    return False
+        return True
+
+    def _sort_key(self, sort):
+        def key(page):
+            if 'timestamp' in sort:
+                value = page[sort['timestamp']]
+            else:
+                value = self._property_value(page, sort['property'])
+            return (value is None, value or '')
+        return key
+
+    def query(self, database_id, body, filter_properties=None):
+        with self._lock:
+            database = self.databases.get(database_id)
+            if database is None:
+                return None
+            pages = [self.pages[page_id] for page_id in database['pages']
+                     if not self.pages[page_id]['archived']]
+            if body.get('filter'):
+                pages = [page for page in pages if self._matches(page, body['filter'])]
+            for sort in reversed(body.get('sorts') or []):
+                pages.sort(key=self._sort_key(sort), reverse=sort.get('direction') == 'descending')
+
+            page_size = min(int(body.get('page_size') or 100), 100)
+            start = int(body.get('start_cursor') or 0)
+            results = pages[start:start + page_size]
+            if filter_properties:
+                wanted = set(filter_properties)
+                results = [
+                    dict(page, properties={name: prop for name, prop in page['properties'].items()
+                                           if prop['id'] in wanted or name in wanted})
+                    for page in results
+                ]
+            else:
+                results = [json.loads(json.dumps(page)) for page in results]
+            more = start + page_size < len(pages)
+            return {
+                'object': 'list', 'results': results,
+                'next_cursor': str(start + page_size) if more else None,
+                'has_more': more, 'type': 'page_or_database', 'page_or_database': {},
+            }
+
+    def retrieve(self, database_id):
+        database = self.databases.get(database_id)
+        if database is None:
+            return None
+        return {key: value for key, value in database.items() if key != 'pages'}
+
+    def update(self, page_id, body):
+        with self._lock:
+            page = self.pages.get(page_id)
+            if page is None:
+                return None
+            schema = self.databases[page['parent']['database_id']]['properties']
+            for name, value in (body.get('properties') or {}).items():
+                prop = schema.get(name) or next((p for p in schema.values() if p['id'] == name), None)
+                if prop is None:
+                    continue
+                prop_type = prop['type']
+                data = value.get(prop_type)
+                if prop_type in ('select', 'status') and data:
+                    data = _option(data['name'])
+                page['properties'][prop['name']] = {'id': prop['id'], 'type': prop_type, prop_type: data}
+            if 'archived' in body:
+                page['archived'] = bool(body['archived'])
+            page['last_edited_time'] = _timestamp(datetime.now(timezone.utc))
+            return json.loads(json.dumps(page))
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def fake_completion(body):
+    """Build a chat completion response for a request body"""
+    messages = body.get('messages') or []
+    prompt = '\n'.join(str(message.get('content', '')) for message in messages)
+    response_format = body.get('response_format') or {}
+    schema_name = (response_format.get('json_schema') or {}).get('name')
+
+    if schema_name == 'task_analysis':
+        # One entry per {"id": ..., "name": ...} line, labels derived from the id
+        entries = []
+        for line in prompt.splitlines():
+            try:
+                task = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(task, dict) and 'id' in task:
+                digest = sum(map(ord, str(task['id'])))
+                entries.append({'id': task['id'], 'impact': LEVELS[digest % 3],
+                                'energy': LEVELS[(digest // 3) % 3]})
+        content = json.dumps({'tasks': entries})
+    else:
+        tasks = re.findall(r'^\s*- (.+)$', prompt, re.MULTILINE)
+        if tasks:
+            content = "Suggested order:\n" + "\n".join(
+                f"{index}. {task}" for index, task in enumerate(tasks, start=1))
+        else:
+            content = "Focus on the most important task first, then batch the small ones."
+        max_tokens = body.get('max_tokens')
+        if max_tokens:
+            content = content[:max_tokens * 4]
+
+    prompt_tokens = estimate_tokens(prompt)
+    completion_tokens = estimate_tokens(content)
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'fake'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content, 'refusal': None},
+            'finish_reason': 'stop', 'logprobs': None,
+        }],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens},
+    }
+
+
+_NOTION_ROUTES = (
+    ('POST', re.compile(r'^/v1/databases/([^/]+)/query$'), 'databases.query'),
+    ('GET', re.compile(r'^/v1/databases/([^/]+)$'), 'databases.retrieve'),
+    ('PATCH', re.compile(r'^/v1/pages/([^/]+)$'), 'pages.update'),
+)
+
+
+def make_handler(workspace, notion_faults, openai_faults, stats):
+    """Build a request handler class serving one FakeWorkspace"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if not length:
+                return {}
+            try:
+                return json.loads(self.rfile.read(length))
+            except ValueError:
+                return {}
+
+        def _send(self, route, status, payload, headers=None):
+            data = json.dumps(payload).encode('utf-8')
+            stats[(route, status)] += 1
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, route, completion, include_usage, delay):
+            # Server-sent events over chunked transfer encoding, one word per chunk
+            stats[(route, 200)] += 1
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            base = {key: completion[key] for key in ('id', 'created', 'model')}
+            content = completion['choices'][0]['message']['content']
+            events = [{'role': 'assistant', 'content': ''}]
+            events += [{'content': word} for word in re.findall(r'\S+\s*', content)]
+            for index, delta in enumerate(events):
+                if index > 1 and delay:
+                    time.sleep(delay)
+                choice = {'index': 0, 'delta': delta, 'finish_reason': None, 'logprobs': None}
+                self._write_event(dict(base, object='chat.completion.chunk', choices=[choice]))
+            choice = {'index': 0, 'delta': {}, 'finish_reason': 'stop', 'logprobs': None}
+            self._write_event(dict(base, object='chat.completion.chunk', choices=[choice]))
+            if include_usage:
+                self._write_event(dict(base, object='chat.completion.chunk', choices=[],
+                                       usage=completion['usage']))
+            self._write_chunk(b'data: [DONE]\n\n')
+            self._write_chunk(b'')
+
+        def _write_event(self, payload):
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        def _notion_error(self, route, status, code, message, headers=None):
+            self._send(route, status, {'object': 'error', 'status': status, 'code': code,
+                                       'message': message}, headers)
+
+        def _openai_error(self, route, status, kind, message, headers=None):
+            self._send(route, status, {'error': {'message': message, 'type': kind,
+                                                 'param': None, 'code': kind}}, headers)
+
+        def _handle(self, method):
+            url = urlparse(self.path)
+            body = self._body() if method != 'GET' else {}
+
+            if method == 'GET' and url.path == '/_stats':
+                payload = {f"{route} {status}": count for (route, status), count in sorted(stats.items())}
+                return self._send('_stats', 200, payload)
+
+            if method == 'POST' and url.path.rstrip('/') == '/v1/chat/completions':
+                route = 'chat.completions'
+                fault = openai_faults.check()
+                if fault == 'rate_limited':
+                    return self._openai_error(route, 429, 'rate_limit_exceeded', 'Rate limit reached',
+                                              {'Retry-After': str(openai_faults.retry_after)})
+                if fault == 'error':
+                    return self._openai_error(route, 500, 'server_error', 'Injected server error')
+                if body.get('stream'):
+                    include_usage = (body.get('stream_options') or {}).get('include_usage')
+                    return self._send_stream(route, fake_completion(body), include_usage,
+                                             openai_faults.stream_delay)
+                completion = fake_completion(body)
+                if openai_faults.stream_delay:
+                    words = len(completion['choices'][0]['message']['content'].split())
+                    time.sleep(openai_faults.stream_delay * words)
+                return self._send(route, 200, completion)
+
+            for route_method, pattern, route in _NOTION_ROUTES:
+                match = pattern.match(url.path)
+                if route_method != method or not match:
+                    continue
+                fault = notion_faults.check()
+                if fault == 'rate_limited':
+                    return self._notion_error(route, 429, 'rate_limited', 'Rate limited',
+                                              {'Retry-After': str(notion_faults.retry_after)})
+                if fault == 'error':
+                    return self._notion_error(route, 500, 'internal_server_error', 'Injected error')
+
+                object_id = match.group(1)
+                if route == 'databases.query':
+                    result = workspace.query(object_id, body,
+                                             parse_qs(url.query).get('filter_properties'))
+                elif route == 'databases.retrieve':
+                    result = workspace.retrieve(object_id)
+                else:
+                    result = workspace.update(object_id, body)
+                if result is None:
+                    return self._notion_error(route, 404, 'object_not_found',
+                                              f"Could not find object with ID: {object_id}.")
+                return self._send(route, 200, result)
+
+            self._send('unknown', 404, {'error': f"no route for {method} {url.path}"})
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def do_PATCH(self):
+            self._handle('PATCH')
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_fake_server(workspace=None, host=DEFAULT_HOST, port=0, notion_faults=None, openai_faults=None):
+    """
+    Start the fake APIs on a background thread.
+
+    Returns:
+        tuple: (server, workspace, stats); the base URL is
+        f"http://{host}:{server.server_address[1]}". Call server.shutdown() to stop.
+    """
+    workspace = workspace or FakeWorkspace()
+    stats = Counter()
+    server = ThreadingHTTPServer((host, port), make_handler(
+        workspace, notion_faults or Faults(), openai_faults or Faults(), stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-services', daemon=True).start()
+    return server, workspace, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Notion and OpenAI APIs for offline benchmarks")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--tasks', type=int, default=200, help="Generated task pages")
+    parser.add_argument('--areas', type=int, default=8, help="Generated area pages")
+    parser.add_argument('--seed', type=int, default=0)
+    for api, rate in (('notion', 3.0), ('openai', None)):
+        parser.add_argument(f'--{api}-latency', type=float, default=0.0, help="Seconds per request")
+        parser.add_argument(f'--{api}-jitter', type=float, default=0.0, help="Extra random seconds")
+        parser.add_argument(f'--{api}-rate', type=float, default=rate, help="Requests/second before 429s")
+        parser.add_argument(f'--{api}-burst', type=float, default=None)
+        parser.add_argument(f'--{api}-error-rate', type=float, default=0.0, help="Fraction of 500s")
+    parser.add_argument('--openai-stream-delay', type=float, default=0.0,
+                        help="Seconds between streamed completion chunks")
+    args = parser.parse_args()
+
+    faults = {
+        api: Faults(
+            latency=getattr(args, f'{api}_latency'), jitter=getattr(args, f'{api}_jitter'),
+            rate=getattr(args, f'{api}_rate'), burst=getattr(args, f'{api}_burst'),
+            error_rate=getattr(args, f'{api}_error_rate'), seed=args.seed,
+            stream_delay=getattr(args, f'{api}_stream_delay', 0.0)
+        )
+        for api in ('notion', 'openai')
+    }
+    workspace = FakeWorkspace(tasks=args.tasks, areas=args.areas, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(
+        workspace, faults['notion'], faults['openai'], Counter()))
+    base_url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"Fake Notion/OpenAI APIs on {base_url}")
+    print(f"NOTION_BASE_URL={base_url}")
+    print(f"OPENAI_BASE_URL={base_url}/v1")
+    print(f"NOTION_DATABASE_ID={workspace.tasks_database_id}")
+    print(f"NOTION_AREAS_DATABASE_ID={workspace.areas_database_id}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
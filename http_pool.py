@@ -0,0 +1,210 @@
+"""One keep-alive connection pool shared by every Notion and OpenAI client.
+
+Each SDK client used to own its HTTP connections (and assistant.py used a
+bare `requests.post`), so every manager, script and executor thread paid
+its own TCP and TLS handshakes. clients.py now builds every httpx client
+on the transport from `get_transport()`. Connections to api.notion.com and
+api.openai.com are opened once and reused across clients and threads.
+
+Closing a client leaves the shared pool open; `close_pools()` shuts it
+down (it also runs at exit). Async clients need a pool bound to their event loop, so
+`get_async_transport()` keeps one per running loop, closed along with the
+last client using it. `pool_stats()` reports
+requests, connections opened and open/idle connections; the synchronous
+pool's numbers are also exported as gauges by metrics.py.
+
+Configuration (environment):
+
+- HTTP_MAX_CONNECTIONS     connections per pool (default 20)
+- HTTP_MAX_KEEPALIVE       idle connections kept open (default 10)
+- HTTP_KEEPALIVE_EXPIRY    seconds an idle connection is kept (default 30)
+- HTTP_CONNECT_TIMEOUT     seconds to establish a connection (default 5)
+- HTTP_TIMEOUT             read/write/pool timeout in seconds; defaults to
+                           60 for Notion and 600 for OpenAI
+- HTTP2=1                  negotiate HTTP/2 (needs the `h2` package)
+"""
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+
+import httpx
+
+from metrics import METRICS
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+
+
+def _http2_enabled():
+    if os.getenv('HTTP2', '').lower() not in ('1', 'true', 'yes'):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("Warning: HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def pool_options():
+    """Keyword arguments for httpx.HTTPTransport / AsyncHTTPTransport"""
+    return {
+        'limits': httpx.Limits(
+            max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)),
+            max_keepalive_connections=int(os.getenv('HTTP_MAX_KEEPALIVE', DEFAULT_MAX_KEEPALIVE)),
+            keepalive_expiry=float(os.getenv('HTTP_KEEPALIVE_EXPIRY', DEFAULT_KEEPALIVE_EXPIRY)),
+        ),
+        'http2': _http2_enabled(),
+    }
+
+
+def timeout(default):
+    """An httpx.Timeout: HTTP_TIMEOUT (or `default`) seconds, HTTP_CONNECT_TIMEOUT to connect"""
+    return httpx.Timeout(
+        float(os.getenv('HTTP_TIMEOUT') or default),
+        connect=float(os.getenv('HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT))
+    )
+
+
+class _PoolStats:
+    """Request and connection counters for a pool"""
+
+    def __init__(self, transport, options):
+        self._transport = transport
+        self._options = options
+        self._seen = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def track(self):
+        # A connection object we have not seen before was opened for this request
+        connections = self._transport._pool.connections
+        with self._lock:
+            self.requests += 1
+            for connection in connections:
+                if connection not in self._seen:
+                    self._seen.add(connection)
+                    self.connections_opened += 1
+
+    def stats(self):
+        connections = self._transport._pool.connections
+        idle = sum(1 for connection in connections if connection.is_idle())
+        limits = self._options['limits']
+        return {
+            'requests': self.requests,
+            'connections_opened': self.connections_opened,
+            'open_connections': len(connections),
+            'idle_connections': idle,
+            'active_connections': len(connections) - idle,
+            'max_connections': limits.max_connections,
+            'max_keepalive_connections': limits.max_keepalive_connections,
+            'http2': self._options['http2'],
+        }
+
+
+class SharedTransport(httpx.BaseTransport):
+    """An HTTPTransport that survives the clients built on it"""
+
+    def __init__(self):
+        options = pool_options()
+        self._transport = httpx.HTTPTransport(**options)
+        self._stats = _PoolStats(self._transport, options)
+
+    def handle_request(self, request):
+        response = self._transport.handle_request(request)
+        self._stats.track()
+        return response
+
+    def close(self):
+        # Called whenever a client using the pool is closed; the pool stays open
+        pass
+
+    def shutdown(self):
+        self._transport.close()
+
+    def stats(self):
+        return self._stats.stats()
+
+
+class AsyncSharedTransport(httpx.AsyncBaseTransport):
+    """`SharedTransport` for httpx.AsyncClient; the last client to close closes the pool"""
+
+    def __init__(self):
+        options = pool_options()
+        self._transport = httpx.AsyncHTTPTransport(**options)
+        self._stats = _PoolStats(self._transport, options)
+        self._clients = 0
+        self.closed = False
+
+    def acquire(self):
+        self._clients += 1
+        return self
+
+    async def handle_async_request(self, request):
+        response = await self._transport.handle_async_request(request)
+        self._stats.track()
+        return response
+
+    async def aclose(self):
+        self._clients -= 1
+        if self._clients <= 0:
+            await self.shutdown()
+
+    async def shutdown(self):
+        self.closed = True
+        await self._transport.aclose()
+
+    def stats(self):
+        return self._stats.stats()
+
+
+_lock = threading.Lock()
+_transport = None
+_async_transports = weakref.WeakKeyDictionary()
+
+
+def get_transport():
+    """The process-wide synchronous pool"""
+    global _transport
+    with _lock:
+        if _transport is None:
+            _transport = SharedTransport()
+            METRICS.register_collector('http_pool', _transport.stats)
+            atexit.register(close_pools)
+        return _transport
+
+
+def get_async_transport():
+    """The pool for the running event loop (a private one outside a loop)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return AsyncSharedTransport().acquire()
+    with _lock:
+        transport = _async_transports.get(loop)
+        if transport is None or transport.closed:
+            transport = _async_transports[loop] = AsyncSharedTransport()
+        return transport.acquire()
+
+
+def pool_stats():
+    """Stats of the synchronous pool and of each open async pool"""
+    with _lock:
+        stats = {'sync': _transport.stats() if _transport is not None else None}
+        stats['async'] = [transport.stats() for transport in list(_async_transports.values())
+                          if not transport.closed]
+    return stats
+
+
+def close_pools():
+    """Close the synchronous pool's connections (async pools close with their clients)"""
+    global _transport
+    with _lock:
+        transport, _transport = _transport, None
+    if transport is not None:
+        transport.shutdown()
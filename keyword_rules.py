@@ -0,0 +1,219 @@
+"""Keyword rules for suggesting importance and urgency from a task name.
+
+A rule set maps each category to weighted keywords and score thresholds:
+
+    {
+        "importance": {
+            "keywords": {"critical": 2, "key": {"weight": 1, "word_boundary": true}},
+            "levels": {"high": 1},
+            "default": "medium"
+        },
+        "urgency": {"keywords": ["asap", "today", "heute", "aujourd'hui"]}
+    }
+
+A keyword list is shorthand for weight 1 each. A category's label is the
+highest level whose threshold its score reaches, or `default` when none
+is. Keywords match as substrings unless `word_boundary` is set (per
+keyword, or for the whole category).
+
+Every keyword of every category is compiled into one Aho-Corasick
+automaton, so a name is scanned once however many keywords there are.
+"""
+import json
+import os
+from collections import deque
+
+# The keyword lists suggest_importance_urgency has always used
+DEFAULT_RULES = {
+    'importance': {
+        'keywords': ['essential', 'critical', 'key', 'main', 'major', 'primary', 'deadline',
+                     'install', 'setup', 'configure', 'implement'],
+        'levels': {'high': 1},
+        'default': 'medium',
+    },
+    'urgency': {
+        'keywords': ['asap', 'immediately', 'urgent', 'deadline', 'due', 'today', 'tomorrow'],
+        'levels': {'high': 1},
+        'default': 'medium',
+    },
+}
+
+
+class RuleError(Exception):
+    """Raised when a keyword rules file is malformed"""
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a fixed set of lowercase keywords"""
+
+    def __init__(self, keywords):
+        self.keywords = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for keyword in keywords:
+            self._add(keyword.lower())
+        self._link()
+
+    def _add(self, keyword):
+        if not keyword or keyword in self.keywords:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(len(self.keywords))
+        self.keywords.append(keyword)
+
+    def _link(self):
+        # Breadth-first, so every fail target is finished before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+                queue.append(next_state)
+
+    def find(self, text):
+        """
+        Yield (keyword index, start, end) for every occurrence in one pass.
+
+        `text` must already be lowercase.
+        """
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for index in self._out[state]:
+                yield index, end - len(self.keywords[index]), end
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _at_word_boundary(text, start, end):
+    return ((start == 0 or not _is_word_char(text[start - 1]))
+            and (end == len(text) or not _is_word_char(text[end])))
+
+
+def _normalize_category(category, spec):
+    if not isinstance(spec, dict):
+        raise RuleError(f"rules for '{category}' must be an object")
+    keywords = spec.get('keywords', {})
+    if isinstance(keywords, list):
+        keywords = {keyword: 1 for keyword in keywords}
+    if not isinstance(keywords, dict):
+        raise RuleError(f"keywords for '{category}' must be a list or an object")
+
+    word_boundary = spec.get('word_boundary', False)
+    rules = {}
+    for keyword, rule in keywords.items():
+        if not isinstance(rule, dict):
+            rule = {'weight': rule}
+        try:
+            weight = float(rule.get('weight', 1))
+        except (TypeError, ValueError):
+            raise RuleError(f"keyword '{keyword}' in '{category}' has a non-numeric weight")
+        rules[keyword.lower()] = (weight, rule.get('word_boundary', word_boundary))
+
+    levels = spec.get('levels', {'high': 1})
+    levels = sorted(((float(threshold), label) for label, threshold in levels.items()), reverse=True)
+    return {'keywords': rules, 'levels': levels, 'default': spec.get('default', 'medium')}
+
+
+def merge_rules(*rule_sets):
+    """Merge rule sets category by category; later keywords and settings win"""
+    merged = {}
+    for rules in rule_sets:
+        for category, spec in rules.items():
+            spec = dict(spec)
+            keywords = spec.get('keywords', {})
+            if isinstance(keywords, list):
+                keywords = {keyword: 1 for keyword in keywords}
+            current = merged.setdefault(category, {'keywords': {}})
+            current['keywords'].update(keywords)
+            spec.pop('keywords', None)
+            current.update(spec)
+    return merged
+
+
+class KeywordRules:
+    def __init__(self, rules=DEFAULT_RULES):
+        """
+        Compile a rule set (see module docs) into a single matcher.
+
+        Args:
+            rules (dict): category -> {'keywords', 'levels', 'default', 'word_boundary'}
+        """
+        self.categories = {
+            category: _normalize_category(category, spec) for category, spec in rules.items()
+        }
+        self.matcher = KeywordMatcher(
+            keyword for spec in self.categories.values() for keyword in spec['keywords']
+        )
+
+    @classmethod
+    def from_files(cls, paths, base=DEFAULT_RULES):
+        """Load rules from JSON files (e.g. one per language) merged over `base`"""
+        rule_sets = [base] if base else []
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    rule_sets.append(json.load(f))
+            except (OSError, ValueError) as e:
+                raise RuleError(f"Could not read keyword rules {path}: {e}")
+        return cls(merge_rules(*rule_sets))
+
+    @classmethod
+    def from_env(cls):
+        """Load the files listed in KEYWORD_RULES_PATH (os.pathsep-separated), else the defaults"""
+        paths = [path for path in os.getenv('KEYWORD_RULES_PATH', '').split(os.pathsep) if path]
+        return cls.from_files(paths) if paths else cls()
+
+    def score(self, text):
+        """
+        Score a text against every category in one pass.
+
+        Returns:
+            dict: category -> {'label', 'score', 'matched'}, where `matched`
+            lists each matching keyword once, in order of first appearance
+        """
+        text = text.lower()
+        results = {
+            category: {'label': spec['default'], 'score': 0.0, 'matched': []}
+            for category, spec in self.categories.items()
+        }
+        seen = set()
+        for index, start, end in self.matcher.find(text):
+            keyword = self.matcher.keywords[index]
+            for category, spec in self.categories.items():
+                rule = spec['keywords'].get(keyword)
+                if rule is None or (category, keyword) in seen:
+                    continue
+                weight, word_boundary = rule
+                if word_boundary and not _at_word_boundary(text, start, end):
+                    continue
+                seen.add((category, keyword))
+                results[category]['score'] += weight
+                results[category]['matched'].append(keyword)
+
+        for category, spec in self.categories.items():
+            result = results[category]
+            result['label'] = next(
+                (label for threshold, label in spec['levels'] if result['score'] >= threshold),
+                spec['default']
+            )
+        return results
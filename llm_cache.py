@@ -0,0 +1,222 @@
+"""Disk-backed cache for chat completion responses.
+
+Responses are stored in SQLite under a SHA-256 hash of the request
+(model, messages, temperature, max_tokens and any other arguments that
+change the answer). Entries expire after a TTL, and once the cache holds
+more than `max_entries` rows the least recently used ones are evicted.
+
+Concurrent lookups of the same key are coalesced: the first caller makes
+the API request and everyone else waiting on that key gets its result.
+
+`ChatStream` is the streaming counterpart of `cached_chat_content`. It
+yields content deltas as they arrive and caches the full reply at the end.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import GPT, METRICS
+
+DEFAULT_CACHE_PATH = '.llm_cache.sqlite3'
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_by_access ON responses (accessed_at);
+"""
+
+
+def make_key(model, messages, temperature=None, max_tokens=None, **kwargs):
+    """Hash a chat completion request into a cache key"""
+    request = dict(kwargs, model=model, messages=messages,
+                   temperature=temperature, max_tokens=max_tokens)
+    encoded = json.dumps(request, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """Open the cache named by LLM_CACHE_PATH, or return None if unset"""
+        path = os.getenv('LLM_CACHE_PATH')
+        if not path:
+            return None
+        return cls(
+            path,
+            ttl=float(os.getenv('LLM_CACHE_TTL', DEFAULT_TTL)),
+            max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, key):
+        """Return the cached content for a key, or None if missing or expired"""
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, content):
+        """Store content for a key, evicting least recently used entries if full"""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, content, now, now)
+            )
+            self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached content for a key, calling `compute()` on a miss.
+
+        Only one `compute()` runs per key at a time; concurrent callers for
+        the same key wait for it and share the result. Exceptions are passed
+        to every waiter and nothing is cached.
+        """
+        content = self.get(key)
+        if content is not None:
+            return content
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            # Another leader may have finished between our lookup and registering
+            content = self.get(key)
+            if content is None:
+                content = compute()
+                self.set(key, content)
+            future.set_result(content)
+            return content
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+def cached_chat_content(client, cache, **kwargs):
+    """
+    Run `client.chat.completions.create(**kwargs)` through a cache.
+
+    Returns the first choice's message content. With `cache=None` this is
+    just an uncached call.
+    """
+    def compute():
+        response = client.chat.completions.create(**kwargs)
+        METRICS.record_usage(kwargs.get('model'), getattr(response, 'usage', None))
+        return response.choices[0].message.content or ''
+
+    with METRICS.stage(GPT):
+        if cache is None:
+            return compute()
+        return cache.get_or_compute(make_key(**kwargs), compute)
+
+
+class ChatStream:
+    """
+    A chat completion streamed as content deltas, through a cache.
+
+    Iterating yields each piece of content as soon as the API sends it (a
+    cached reply comes as one piece). Afterwards `content` holds the whole
+    reply, which is cached under the same key `cached_chat_content` uses.
+    `first_token_seconds` and `seconds` are the time to the first content
+    and to the end; both are also recorded in METRICS. Streams are not
+    coalesced like `LLMCache.get_or_compute` calls.
+    """
+
+    def __init__(self, client, cache, **kwargs):
+        self.client = client
+        self.cache = cache
+        self.kwargs = kwargs
+        self.content = None
+        self.cached = False
+        self.first_token_seconds = None
+        self.seconds = None
+
+    def _deltas(self):
+        if self.cache is not None:
+            content = self.cache.get(make_key(**self.kwargs))
+            if content is not None:
+                self.cached = True
+                yield content
+                return
+        response = self.client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **self.kwargs)
+        try:
+            for chunk in response:
+                # With include_usage the last chunk has the usage and no choices
+                if getattr(chunk, 'usage', None):
+                    METRICS.record_usage(self.kwargs.get('model'), chunk.usage)
+                for choice in chunk.choices:
+                    if choice.index == 0 and choice.delta.content:
+                        yield choice.delta.content
+        finally:
+            response.close()
+
+    def __iter__(self):
+        model = self.kwargs.get('model')
+        start = time.perf_counter()
+        parts = []
+        try:
+            for delta in self._deltas():
+                if self.first_token_seconds is None:
+                    self.first_token_seconds = time.perf_counter() - start
+                    METRICS.observe('openai_time_to_first_token_seconds', self.first_token_seconds,
+                                    model=model)
+                parts.append(delta)
+                yield delta
+        finally:
+            self.seconds = time.perf_counter() - start
+            METRICS.record_stage(GPT, self.seconds)
+        self.content = ''.join(parts)
+        METRICS.observe('openai_stream_seconds', self.seconds, model=model)
+        if self.cache is not None and not self.cached:
+            self.cache.set(make_key(**self.kwargs), self.content)
+
+    def summary(self):
+        """Timings for humans, e.g. 'first token after 0.21s, done in 2.40s'"""
+        if self.first_token_seconds is None:
+            return f"no content, done in {self.seconds or 0:.2f}s"
+        return f"first token after {self.first_token_seconds:.2f}s, done in {self.seconds:.2f}s"
@@ -0,0 +1,357 @@
+"""Instrumentation for the task pipelines.
+
+One process-wide registry, `METRICS`, collects:
+
+- stage timers: wall time spent fetching pages, parsing them, looking up
+  areas, classifying tasks, waiting on GPT and writing results back
+  (`stage()` around a block, `timed_iter()` around a page iterator).
+  Stages can nest and concurrent work is summed, so the totals say where
+  time goes rather than adding up to the run time;
+- API calls per endpoint and status, with latency histograms, recorded by
+  httpx event hooks on the Notion and OpenAI clients (see clients.py), so
+  every 429 and every SDK-level retry attempt is counted;
+- retries made by our own code (`record_retry`);
+- OpenAI prompt/completion tokens per call (`record_usage`).
+
+`to_json()` and `to_prometheus()` export a snapshot. The scripts accept
+`--metrics PATH` (or METRICS_PATH; a `.prom` suffix selects Prometheus
+text) and `--profile [PATH]` to run under cProfile, see `run_main()`.
+"""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+FETCH = 'fetch'
+PARSE = 'parse'
+AREA_LOOKUP = 'area_lookup'
+CLASSIFY = 'classify'
+GPT = 'gpt'
+WRITE_BACK = 'write_back'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+_ID_SEGMENT = re.compile(r'/[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}(?=/|$)')
+
+
+def route_template(path):
+    """An API path with object ids replaced, e.g. /v1/databases/{id}/query"""
+    return _ID_SEGMENT.sub('/{id}', path)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _prometheus_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative(self):
+        """(upper bound, observations at or below it) pairs, ending with +Inf"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            pairs.append((bound, total))
+        pairs.append(('+Inf', self.count))
+        return pairs
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collectors = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.stages = {}
+            self.counters = {}
+            self.histograms = {}
+
+    # -- recording ---------------------------------------------------------
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def register_collector(self, name, collect):
+        """Report `collect()` (a flat dict of numbers) as gauges named `name`_<key> in every snapshot"""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def record_stage(self, name, seconds, count=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stage['count'] += count
+            stage['seconds'] += seconds
+            stage['max_seconds'] = max(stage['max_seconds'], seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block (including any awaits) as one run of a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def timed_iter(self, iterable, name):
+        """
+        Yield from `iterable`, counting the time spent producing items as `name`.
+
+        Recorded once, when the iterator is exhausted or closed, so a lazily
+        paged query shows up as one fetch however many pages it has.
+        """
+        iterator = iter(iterable)
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            self.record_stage(name, elapsed)
+
+    async def atimed_iter(self, aiterable, name):
+        """`timed_iter` for async iterators"""
+        iterator = aiterable.__aiter__()
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            self.record_stage(name, elapsed)
+
+    def record_api_call(self, api, method, route, status, seconds):
+        self.inc('api_requests_total', api=api, method=method, route=route, status=status)
+        self.observe('api_request_seconds', seconds, api=api, route=route)
+        if status == 429:
+            self.inc('api_rate_limited_total', api=api)
+
+    def record_retry(self, api, reason):
+        self.inc('api_retries_total', api=api, reason=reason)
+
+    def record_usage(self, model, usage):
+        """Count the token usage of one OpenAI response (`response.usage`)"""
+        if usage is None:
+            return
+        prompt = getattr(usage, 'prompt_tokens', 0) or 0
+        completion = getattr(usage, 'completion_tokens', 0) or 0
+        self.inc('openai_calls_total', model=model)
+        self.inc('openai_prompt_tokens_total', prompt, model=model)
+        self.inc('openai_completion_tokens_total', completion, model=model)
+        self.observe('openai_prompt_tokens', prompt, TOKEN_BUCKETS, model=model)
+        self.observe('openai_completion_tokens', completion, TOKEN_BUCKETS, model=model)
+
+    # -- export ------------------------------------------------------------
+
+    def snapshot(self):
+        """The collected metrics as plain JSON-serializable data"""
+        with self._lock:
+            collectors = list(self._collectors.items())
+        gauges = {name: collect() for name, collect in collectors}
+        with self._lock:
+            return {
+                'gauges': gauges,
+                'started': self.started,
+                'elapsed_seconds': time.time() - self.started,
+                'stages': {name: dict(stage) for name, stage in self.stages.items()},
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items(), key=lambda item: item[0])
+                ],
+                'histograms': [
+                    {'name': name, 'labels': dict(labels), 'count': histogram.count,
+                     'sum': histogram.sum, 'buckets': [[bound, count] for bound, count in histogram.cumulative()]}
+                    for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0])
+                ],
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix='notion_tasks_'):
+        """The collected metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+
+        lines.append(f"# TYPE {prefix}stage_seconds_total counter")
+        for name, stage in snapshot['stages'].items():
+            lines.append(f'{prefix}stage_seconds_total{{stage="{name}"}} {stage["seconds"]}')
+        lines.append(f"# TYPE {prefix}stage_runs_total counter")
+        for name, stage in snapshot['stages'].items():
+            lines.append(f'{prefix}stage_runs_total{{stage="{name}"}} {stage["count"]}')
+
+        declared = set()
+        for counter in snapshot['counters']:
+            name = prefix + counter['name']
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_prometheus_labels(_label_key(counter['labels']))} {counter['value']}")
+
+        for group, values in snapshot['gauges'].items():
+            for key, value in values.items():
+                name = f"{prefix}{group}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {int(value) if isinstance(value, bool) else value}")
+
+        for histogram in snapshot['histograms']:
+            name = prefix + histogram['name']
+            key = _label_key(histogram['labels'])
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in histogram['buckets']:
+                lines.append(f"{name}_bucket{_prometheus_labels(key, [('le', bound)])} {count}")
+            lines.append(f"{name}_sum{_prometheus_labels(key)} {histogram['sum']}")
+            lines.append(f"{name}_count{_prometheus_labels(key)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write a snapshot to `path`: Prometheus text for .prom/.txt, JSON otherwise"""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json() + "\n"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def summary(self):
+        """A short human-readable table of the stage timers"""
+        lines = [f"{'stage':<12} {'runs':>6} {'seconds':>10} {'max':>8}"]
+        for name, stage in self.snapshot()['stages'].items():
+            lines.append(f"{name:<12} {stage['count']:>6} {stage['seconds']:>10.3f} {stage['max_seconds']:>8.3f}")
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
+
+
+def httpx_event_hooks(api, metrics=METRICS):
+    """Event hooks for an `httpx.Client` that record every request under `api`"""
+    def on_request(request):
+        request.extensions['metrics_start'] = time.perf_counter()
+
+    def on_response(response):
+        request = response.request
+        start = request.extensions.get('metrics_start')
+        if start is not None:
+            metrics.record_api_call(api, request.method, route_template(request.url.path),
+                                    response.status_code, time.perf_counter() - start)
+
+    return {'request': [on_request], 'response': [on_response]}
+
+
+def async_httpx_event_hooks(api, metrics=METRICS):
+    """`httpx_event_hooks` for an `httpx.AsyncClient`"""
+    hooks = httpx_event_hooks(api, metrics)
+
+    async def on_request_async(request):
+        hooks['request'][0](request)
+
+    async def on_response_async(response):
+        hooks['response'][0](response)
+
+    return {'request': [on_request_async], 'response': [on_response_async]}
+
+
+@contextmanager
+def profiled(path=None, limit=30, stream=None):
+    """
+    Run the enclosed block under cProfile.
+
+    Prints the `limit` most expensive functions by cumulative time to
+    `stream` (stderr by default); with `path`, also dumps the raw stats
+    there for `python -m pstats` or a viewer such as snakeviz.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(limit)
+        print(report.getvalue(), file=stream or sys.stderr)
+
+
+def add_arguments(parser):
+    """Add --profile and --metrics to an argparse parser"""
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='PATH',
+                        help="Run under cProfile; print a report and optionally save the stats to PATH")
+    parser.add_argument('--metrics', default=os.getenv('METRICS_PATH'), metavar='PATH',
+                        help="Write collected metrics to PATH (.prom for Prometheus text, else JSON)")
+    return parser
+
+
+def run_main(main, args=None):
+    """
+    Run a script's `main()` honouring --profile/--metrics.
+
+    `args` is a namespace from a parser passed through `add_arguments`;
+    without one the two options are read from the command line.
+    """
+    if args is None:
+        args, _ = add_arguments(argparse.ArgumentParser(add_help=False)).parse_known_args()
+    try:
+        if args.profile is not None:
+            with profiled(args.profile or None):
+                return main()
+        return main()
+    finally:
+        if args.profile is not None:
+            print(METRICS.summary(), file=sys.stderr)
+        if args.metrics:
+            METRICS.write(args.metrics)
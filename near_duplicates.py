@@ -0,0 +1,173 @@
+"""Near-duplicate task names with MinHash and locality-sensitive hashing.
+
+Task databases collect near-identical tasks ("Fix OpenAI API
+integration", "Fix openai integration"). Comparing every pair is
+quadratic. `DuplicateIndex` instead
+
+1. normalizes each name (lowercase, letters and digits only, single
+   spaces) and splits it into character 3-grams (shingles);
+2. builds a MinHash signature: for each of `num_perm` random hash
+   functions, the smallest hash over the name's shingles. Two signatures
+   agree at a position with probability equal to the Jaccard similarity
+   of the shingle sets;
+3. cuts the signature into bands and buckets each band (LSH). Names that
+   share any bucket become candidates. Band width is chosen so that a
+   pair right at `threshold` is a candidate at least 95% of the time;
+4. checks each candidate with the exact Jaccard similarity of the shingle
+   sets, so every reported similarity is exact.
+
+Adding a name and looking one up cost about O(num_perm) plus the
+candidates found, so clustering N names takes roughly linear time instead
+of N^2 comparisons. `clusters()` groups names connected by pairs at or
+above the threshold (union-find).
+
+Shingles are hashed with CRC32 and the hash functions come from a fixed
+seed, so signatures are the same in every process.
+
+Configuration (environment):
+
+- DUPLICATE_THRESHOLD   Jaccard similarity that counts as a duplicate (default 0.8)
+"""
+import os
+import re
+import zlib
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+SHINGLE_SIZE = 3
+CANDIDATE_RECALL = 0.95
+
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def normalize_name(name):
+    """Lowercase words of a task name joined by single spaces, punctuation dropped"""
+    return ' '.join(_WORD.findall((name or '').lower()))
+
+
+def shingles(name, size=SHINGLE_SIZE):
+    """Character `size`-grams of the normalized name, padded so short words still count"""
+    text = f" {normalize_name(name)} "
+    if len(text) <= size:
+        return frozenset((text,))
+    return frozenset(text[i:i + size] for i in range(len(text) - size + 1))
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def choose_rows(threshold, num_perm, recall=CANDIDATE_RECALL):
+    """Rows per LSH band: the widest band that still finds a pair at `threshold` with `recall`"""
+    best = 1
+    for rows in range(1, num_perm + 1):
+        # Leftover signature positions past the last full band are not bucketed
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = rows
+    return best
+
+
+class DuplicateIndex:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, seed=1):
+        """
+        Args:
+            threshold (float): Jaccard similarity of shingles at which names are duplicates
+            num_perm (int): MinHash functions per signature
+            seed (int): Seed for the hash functions
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.rows = choose_rows(threshold, num_perm)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+        self._buckets = [{} for _ in range(num_perm // self.rows)]
+        self.keys = []
+        self.values = []
+        self._shingles = []
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """An index using the threshold in DUPLICATE_THRESHOLD, if set"""
+        threshold = float(os.getenv('DUPLICATE_THRESHOLD', DEFAULT_THRESHOLD))
+        return cls(**dict({'threshold': threshold}, **kwargs))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def signature(self, grams):
+        hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) % _PRIME for gram in grams),
+                             dtype=np.uint64, count=len(grams))
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _bands(self, signature):
+        rows = self.rows
+        for band in range(len(self._buckets)):
+            yield band, signature[band * rows:(band + 1) * rows].tobytes()
+
+    def add(self, key, name, value=None):
+        """Index a task name under `key`, with an optional payload (e.g. its labels)"""
+        grams = shingles(name)
+        position = len(self.keys)
+        self.keys.append(key)
+        self.values.append(value)
+        self._shingles.append(grams)
+        for band, bucket in self._bands(self.signature(grams)):
+            self._buckets[band].setdefault(bucket, []).append(position)
+        return position
+
+    def _candidates(self, grams):
+        found = set()
+        for band, bucket in self._bands(self.signature(grams)):
+            found.update(self._buckets[band].get(bucket, ()))
+        return found
+
+    def query(self, name, threshold=None):
+        """(key, value, similarity) of indexed names at least `threshold` similar, most similar first"""
+        threshold = self.threshold if threshold is None else threshold
+        grams = shingles(name)
+        matches = []
+        for position in self._candidates(grams):
+            similarity = jaccard(grams, self._shingles[position])
+            if similarity >= threshold:
+                matches.append((self.keys[position], self.values[position], similarity))
+        matches.sort(key=lambda match: -match[2])
+        return matches
+
+    def pairs(self):
+        """Yield (position, position, similarity) for every indexed pair at or above the threshold"""
+        seen = set()
+        for bands in self._buckets:
+            for members in bands.values():
+                for i, first in enumerate(members):
+                    for second in members[i + 1:]:
+                        if (first, second) in seen:
+                            continue
+                        seen.add((first, second))
+                        similarity = jaccard(self._shingles[first], self._shingles[second])
+                        if similarity >= self.threshold:
+                            yield first, second, similarity
+
+    def clusters(self):
+        """Groups of two or more indexed keys linked by near-duplicate pairs, largest first"""
+        parent = list(range(len(self.keys)))
+
+        def find(position):
+            while parent[position] != position:
+                parent[position] = parent[parent[position]]
+                position = parent[position]
+            return position
+
+        for first, second, _ in self.pairs():
+            parent[find(first)] = find(second)
+
+        groups = {}
+        for position in range(len(self.keys)):
+            groups.setdefault(find(position), []).append(self.keys[position])
+        return sorted((group for group in groups.values() if len(group) > 1), key=len, reverse=True)
@@ -0,0 +1,50 @@
+"""Cursor-following helpers for Notion database queries.
+
+Notion returns at most 100 rows per `databases.query` call and signals the
+rest with `has_more`/`next_cursor`. These generators follow the cursor so
+callers see the whole database while only one API page is held in memory.
+"""
+from metrics import FETCH, METRICS, PARSE
+
+NOTION_MAX_PAGE_SIZE = 100
+
+
+def iter_query_batches(notion, database_id, page_size=NOTION_MAX_PAGE_SIZE, **query):
+    """Yield the `results` list of each API page of a database query.
+
+    Args:
+        notion: A `notion_client.Client`
+        database_id (str): Database to query
+        page_size (int): Rows per request (Notion caps this at 100)
+        **query: Extra `databases.query` arguments (filter, sorts, ...)
+    """
+    cursor = None
+    while True:
+        kwargs = dict(query, page_size=min(page_size, NOTION_MAX_PAGE_SIZE))
+        if cursor:
+            kwargs['start_cursor'] = cursor
+        response = notion.databases.query(database_id=database_id, **kwargs)
+        yield response.get('results', [])
+
+        cursor = response.get('next_cursor')
+        if not response.get('has_more') or not cursor:
+            break
+
+
+def iter_query_results(notion, database_id, **query):
+    """Yield every page object of a database query, one at a time."""
+    for batch in iter_query_batches(notion, database_id, **query):
+        yield from batch
+
+
+def iter_parsed(notion, database_id, parse, **query):
+    """Yield `parse(page)` for every page of a query, skipping `None` results.
+
+    Parsing happens as each API page arrives, so downstream work can start
+    before the last page has been fetched.
+    """
+    for page in METRICS.timed_iter(iter_query_results(notion, database_id, **query), FETCH):
+        with METRICS.stage(PARSE):
+            item = parse(page)
+        if item is not None:
+            yield item
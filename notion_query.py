@@ -0,0 +1,155 @@
+"""Build `databases.query` arguments that let Notion do the filtering.
+
+Fetches used to download every page with every property and drop the
+ones they didn't want afterwards. A `QueryBuilder` states what a fetch
+needs in terms of task fields. It resolves them through a compiled
+PageExtractor, so renamed properties and select-vs-status types are
+handled. It renders:
+
+- `filter`: status exclusions/inclusions and due-date windows;
+- `sorts`: by field, by property name or by page timestamp;
+- `filter_properties`: only the mapped properties are returned.
+
+    query = QueryBuilder(extractor).exclude('status', 'Completed').due_within(7).select()
+    iter_query_results(notion, database_id, **query.build())
+
+Conditions and sorts on fields the database doesn't have are left out
+rather than sent, because Notion would reject the whole query. Status values that
+are not options of the property are left out for the same reason.
+`matches(fields)` applies the same conditions to extracted fields, for
+pages served from the local mirror.
+"""
+from datetime import date, timedelta
+
+TIMESTAMPS = ('created_time', 'last_edited_time')
+
+
+def _iso(day):
+    return day.isoformat() if isinstance(day, date) else str(day)[:10]
+
+
+def _option_names(prop):
+    config = prop.get(prop['type']) or {}
+    options = config.get('options')
+    return None if options is None else {option['name'] for option in options}
+
+
+class QueryBuilder:
+    def __init__(self, extractor=None):
+        """
+        Args:
+            extractor (PageExtractor): Resolves field names to properties;
+                without one only raw property-name sorts can be rendered
+        """
+        self.extractor = extractor
+        self._conditions = []
+        self._sorts = []
+        self._projection = None
+
+    def _property(self, field):
+        return self.extractor.properties.get(field) if self.extractor is not None else None
+
+    def exclude(self, field, *values):
+        """Drop pages whose select/status `field` is one of `values`"""
+        self._conditions.append((field, 'not_in', values))
+        return self
+
+    def include(self, field, *values):
+        """Keep only pages whose select/status `field` is one of `values`"""
+        self._conditions.append((field, 'in', values))
+        return self
+
+    def due_between(self, start=None, end=None, field='due_date'):
+        """Keep pages whose date `field` is within [start, end]; pages without a date are dropped"""
+        if start:
+            self._conditions.append((field, 'on_or_after', _iso(start)))
+        if end:
+            self._conditions.append((field, 'on_or_before', _iso(end)))
+        return self
+
+    def due_within(self, days, field='due_date', today=None):
+        """Keep pages due at most `days` days from today, overdue ones included"""
+        return self.due_between(end=(today or date.today()) + timedelta(days=days), field=field)
+
+    def sort(self, field, direction='ascending'):
+        """Sort by a field, a page timestamp ('created_time'/'last_edited_time') or a property name"""
+        self._sorts.append((field, direction))
+        return self
+
+    def select(self, *fields):
+        """Only return the properties of these fields (of every mapped field when none are given)"""
+        self._projection = fields
+        return self
+
+    def _resolved_conditions(self):
+        """(property, op, values) for every condition the schema can express"""
+        for field, op, value in self._conditions:
+            prop = self._property(field)
+            if prop is None:
+                continue
+            if op in ('in', 'not_in'):
+                options = _option_names(prop)
+                known = tuple(v for v in value if options is None or v in options)
+                # Nothing can match an unknown option: excluding it is a no-op,
+                # and including only unknown options is left to Notion to answer
+                value = known if known or op == 'not_in' else value
+            yield field, prop, op, value
+
+    def _filter(self):
+        filters = []
+        for _, prop, op, value in self._resolved_conditions():
+            name, kind = prop['name'], prop['type']
+            if op == 'not_in':
+                filters.extend({'property': name, kind: {'does_not_equal': v}} for v in value)
+            elif op == 'in':
+                any_of = [{'property': name, kind: {'equals': v}} for v in value]
+                filters.append(any_of[0] if len(any_of) == 1 else {'or': any_of})
+            else:
+                filters.append({'property': name, kind: {op: value}})
+        if not filters:
+            return None
+        return filters[0] if len(filters) == 1 else {'and': filters}
+
+    def _render_sorts(self):
+        sorts = []
+        for field, direction in self._sorts:
+            if field in TIMESTAMPS:
+                sorts.append({'timestamp': field, 'direction': direction})
+            else:
+                prop = self._property(field)
+                if prop is None and self.extractor is not None and field in self.extractor.unresolved:
+                    continue
+                sorts.append({'property': prop['name'] if prop else field, 'direction': direction})
+        return sorts
+
+    def build(self, **extra):
+        """Keyword arguments for `databases.query` (and the pagination helpers)"""
+        query = dict(extra)
+        query_filter = self._filter()
+        if query_filter:
+            query['filter'] = query_filter
+        sorts = self._render_sorts()
+        if sorts:
+            query['sorts'] = sorts
+        if self._projection is not None and self.extractor is not None:
+            if self._projection:
+                query['filter_properties'] = [
+                    prop['id'] for prop in map(self._property, self._projection) if prop
+                ]
+            else:
+                query['filter_properties'] = self.extractor.property_ids
+        return query
+
+    def matches(self, fields):
+        """Whether extracted `fields` pass the same conditions `build()` sends to Notion"""
+        for field, _, op, value in self._resolved_conditions():
+            current = fields.get(field)
+            if op == 'not_in' and current in value:
+                return False
+            if op == 'in' and current not in value:
+                return False
+            if op == 'on_or_after' and (not current or current[:10] < value):
+                return False
+            if op == 'on_or_before' and (not current or current[:10] > value):
+                return False
+        return True
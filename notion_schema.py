@@ -0,0 +1,144 @@
+"""Schema-compiled property extractors for Notion pages.
+
+A property map says which task fields we want and where they live:
+
+    {
+        'name': {'name': 'Task', 'type': 'title', 'required': True},
+        'due_date': {'type': 'date'},
+        'importance': 'Importance',
+    }
+
+A bare string is shorthand for `{'name': <string>}`. When `name` is left
+out, the first property of the given type is used. `compile_extractor`
+fetches the database schema once (`databases.retrieve`) and resolves every
+field to a property id and a decoder, so parsing a page is a fixed list of
+direct lookups. Required fields that can't be resolved raise `SchemaError`
+up front; optional ones are reported once instead of failing on every row.
+"""
+import json
+import os
+
+
+class SchemaError(Exception):
+    """Raised when a property map doesn't match a database schema"""
+
+
+def _plain_text(fragments):
+    return ''.join(fragment.get('plain_text', '') for fragment in fragments) or None
+
+
+def _name(option):
+    return option['name'] if option else None
+
+
+DECODERS = {
+    'title': lambda value: _plain_text(value['title']),
+    'rich_text': lambda value: _plain_text(value['rich_text']),
+    'select': lambda value: _name(value['select']),
+    'status': lambda value: _name(value['status']),
+    'multi_select': lambda value: [option['name'] for option in value['multi_select']] or None,
+    'date': lambda value: value['date']['start'] if value['date'] else None,
+    'relation': lambda value: [rel['id'] for rel in value['relation']] or None,
+    'number': lambda value: value['number'],
+    'checkbox': lambda value: value['checkbox'],
+    'url': lambda value: value['url'],
+    'created_time': lambda value: value['created_time'],
+    'last_edited_time': lambda value: value['last_edited_time'],
+}
+
+
+def load_property_map(defaults, env_var='NOTION_PROPERTY_MAP'):
+    """Merge a JSON property map from an environment variable over `defaults`"""
+    overrides = os.getenv(env_var)
+    if not overrides:
+        return dict(defaults)
+    try:
+        return {**defaults, **json.loads(overrides)}
+    except ValueError as e:
+        raise SchemaError(f"{env_var} is not valid JSON: {e}")
+
+
+def _normalize_spec(spec):
+    if isinstance(spec, str):
+        spec = {'name': spec}
+    types = spec.get('type')
+    if isinstance(types, str):
+        types = (types,)
+    return spec.get('name'), tuple(types) if types else None, spec.get('required', False)
+
+
+def _resolve(schema, field, name, types):
+    """Find the schema property for one field, or return an error message"""
+    if name is None:
+        for prop in schema.values():
+            if prop['type'] in types:
+                return prop, None
+        return None, f"no {'/'.join(types)} property for '{field}'"
+
+    prop = schema.get(name)
+    if prop is None:
+        # Match the case-insensitive lookups the parsers have always done
+        prop = next((p for n, p in schema.items() if n.lower() == name.lower()), None)
+    if prop is None:
+        return None, f"property '{name}' for '{field}' not found"
+    if types and prop['type'] not in types:
+        return None, f"property '{name}' for '{field}' is {prop['type']}, expected {'/'.join(types)}"
+    if prop['type'] not in DECODERS:
+        return None, f"property '{name}' for '{field}' has unsupported type {prop['type']}"
+    return prop, None
+
+
+class PageExtractor:
+    def __init__(self, schema, property_map):
+        """
+        Compile a property map against a database schema.
+
+        Args:
+            schema (dict): The `properties` of a database object
+            property_map (dict): field -> property spec (see module docs)
+        """
+        self.fields = []
+        self.properties = {}
+        self.unresolved = []
+        self.warnings = []
+        for field, spec in property_map.items():
+            name, types, required = _normalize_spec(spec)
+            prop, error = _resolve(schema, field, name, types)
+            if prop is None:
+                if required:
+                    raise SchemaError(error)
+                self.warnings.append(error)
+                self.unresolved.append(field)
+                continue
+            self.fields.append((field, prop['name'], prop['id'], DECODERS[prop['type']]))
+            self.properties[field] = prop
+
+    @property
+    def property_ids(self):
+        """Ids of every mapped property, e.g. for `filter_properties`"""
+        return [prop_id for _, _, prop_id, _ in self.fields]
+
+    def extract(self, page):
+        """Return a dict of the mapped fields that have a value on this page"""
+        properties = page['properties']
+        values = {}
+        for field, prop_name, prop_id, decode in self.fields:
+            value = properties.get(prop_name)
+            if value is None:
+                # The property was renamed since the schema was compiled
+                value = next((v for v in properties.values() if v.get('id') == prop_id), None)
+                if value is None:
+                    continue
+            decoded = decode(value)
+            if decoded is not None:
+                values[field] = decoded
+        return values
+
+
+def compile_extractor(notion, database_id, property_map, log=print):
+    """Fetch a database's schema once and compile a PageExtractor for it"""
+    database = notion.databases.retrieve(database_id=database_id)
+    extractor = PageExtractor(database['properties'], property_map)
+    for warning in extractor.warnings:
+        log(f"Warning: {warning}")
+    return extractor
@@ -1,18 +1,14 @@
 from dotenv import load_dotenv
 import os
-import openai
-from notion_client import Client
+from clients import notion_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Notion client
-notion = Client(auth=os.getenv("NOTION_API_KEY"))
-
 def fetch_tasks(database_id):
     """Fetch tasks from the Notion database."""
     try:
-        response = notion.databases.query(database_id=database_id)
+        response = notion_client().databases.query(database_id=database_id)
         print("Tasks fetched successfully!")
         return response.get('results', [])
     except Exception as e:
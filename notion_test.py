@@ -1,4 +1,4 @@
-from notion_client import Client
+from clients import notion_client
 from dotenv import load_dotenv
 import os
 
@@ -7,7 +7,7 @@ load_dotenv()
 def test_notion_connection():
     try:
         # Initialize the client
-        notion = Client(auth=os.getenv('NOTION_API_KEY'))
+        notion = notion_client()
         
         # Try to query the database
         database_id = os.getenv('NOTION_DATABASE_ID')
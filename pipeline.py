@@ -0,0 +1,109 @@
+"""Async producer/consumer stages connected by bounded queues.
+
+    await run_pipeline(source, [
+        Stage('parse', parse),
+        Stage('gpt', analyze, concurrency=3),
+        Stage('write', write, concurrency=3),
+    ])
+
+`source` is an async iterable that feeds the first stage. Each stage runs
+`concurrency` workers. A worker takes one item from the stage's queue and
+passes on whatever the handler (an async generator) yields. A handler
+that only consumes items can be a plain coroutine function. The queues are bounded by
+`queue_size`, so a slow stage makes the stages before it wait instead of
+piling up items. The source stops reading once the queue ahead of it is
+full. Every stage works at the same time, so throughput is set by the
+slowest stage rather than by the sum of all of them.
+
+A stage's `flush` (an async generator) runs once after its last item,
+e.g. to pass on a partly filled batch. An error in a handler is logged
+and that item is dropped. An error in the source ends the input and is
+logged the same way. Items per stage are counted in METRICS as
+`pipeline_items_total`.
+"""
+import asyncio
+import inspect
+import logging
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 100
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, handler, concurrency=1, queue_size=DEFAULT_QUEUE_SIZE, flush=None):
+        """
+        Args:
+            name (str): Used in logs and metrics
+            handler: async generator function item -> items for the next stage,
+                or a coroutine function for a stage that passes nothing on
+            concurrency (int): Workers taking items from this stage's queue
+            queue_size (int): Items waiting for this stage at most
+            flush: Optional async generator function run after the last item
+        """
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        self.flush = flush
+
+
+async def _emit(handler_output, outbox):
+    if not inspect.isasyncgen(handler_output):
+        await handler_output
+        return
+    async for item in handler_output:
+        if outbox is not None:
+            await outbox.put(item)
+
+
+async def _feed(source, outbox, workers):
+    try:
+        async for item in source:
+            await outbox.put(item)
+    except Exception as e:
+        logger.error(f"Error reading pipeline source: {e}")
+    for _ in range(workers):
+        await outbox.put(_DONE)
+
+
+async def _run_stage(stage, inbox, outbox, next_workers):
+    async def work():
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            METRICS.inc('pipeline_items_total', stage=stage.name)
+            try:
+                await _emit(stage.handler(item), outbox)
+            except Exception as e:
+                logger.error(f"Error in pipeline stage '{stage.name}': {e}")
+
+    await asyncio.gather(*(work() for _ in range(stage.concurrency)))
+    if stage.flush is not None:
+        try:
+            await _emit(stage.flush(), outbox)
+        except Exception as e:
+            logger.error(f"Error flushing pipeline stage '{stage.name}': {e}")
+    if outbox is not None:
+        for _ in range(next_workers):
+            await outbox.put(_DONE)
+
+
+async def run_pipeline(source, stages):
+    """Run `source` through `stages` until every item has passed the last stage"""
+    queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in stages]
+    runs = [_feed(source, queues[0], stages[0].concurrency)]
+    for index, stage in enumerate(stages):
+        last = index == len(stages) - 1
+        runs.append(_run_stage(
+            stage,
+            queues[index],
+            None if last else queues[index + 1],
+            0 if last else stages[index + 1].concurrency
+        ))
+    await asyncio.gather(*runs)
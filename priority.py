@@ -0,0 +1,174 @@
+"""Weighted priority scores and "what next" selection.
+
+A task's score is a weighted sum of components, each scaled to 0..1:
+
+- importance, urgency, impact: High 1, Medium 0.5, Low 0. Importance and
+  urgency count as 0 when unset, as they do in the Eisenhower quadrants.
+  A missing Impact counts as 0.5.
+- energy: the inverse, so a low-energy task scores 1 and is easier to start.
+- due: 1 when due today or overdue, falling linearly to 0 at DUE_HORIZON
+  days out; 0 without a due date.
+- maslow: lower needs first, from Physiological (1) to
+  Self-Actualization (0.2). A task in several areas takes its best level.
+
+Override any weight with JSON in PRIORITY_WEIGHTS, e.g. `{"energy": 0,
+"due": 5}`. `top_k(tasks, n, filters)` returns the `n` best tasks from
+any iterable. It keeps a heap of `n` entries (`heapq.nlargest`), so it
+runs in O(N log n) over a stream of N tasks and never holds or sorts the
+whole backlog. Ties keep stream order.
+
+Unless the model is given a fixed `now`, every `top_k` call measures
+days-to-due from the current date. A long-lived model (e.g. in the
+daemon) therefore stays correct after midnight.
+"""
+import heapq
+import json
+import os
+from datetime import datetime
+
+from task_model import NO_DUE_DATE, parse_due_date
+
+DEFAULT_WEIGHTS = {
+    'importance': 3.0,
+    'urgency': 2.0,
+    'impact': 2.0,
+    'energy': 1.0,
+    'due': 3.0,
+    'maslow': 1.0,
+}
+
+DUE_HORIZON = 14
+
+LEVEL_SCORES = {
+    'high': 1.0, 'important': 1.0, 'urgent': 1.0, 'yes': 1.0,
+    'medium': 0.5,
+    'low': 0.0, 'no': 0.0,
+}
+
+MASLOW_SCORES = {
+    'physiological': 1.0,
+    'safety': 0.8,
+    'love/belonging': 0.6,
+    'esteem': 0.4,
+    'self-actualization': 0.2,
+}
+
+
+class PriorityError(Exception):
+    """Raised for an invalid PRIORITY_WEIGHTS setting"""
+
+
+def _level(value, missing):
+    if not value:
+        return missing
+    return LEVEL_SCORES.get(value.lower(), missing)
+
+
+class PriorityModel:
+    def __init__(self, weights=None, now=None, due_horizon=DUE_HORIZON):
+        """
+        Args:
+            weights (dict): Component -> weight, merged over DEFAULT_WEIGHTS
+            now (datetime): Fixed reference time for days-to-due (default: the current date)
+            due_horizon (int): Days out at which the due-date component reaches 0
+        """
+        unknown = set(weights or ()) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise PriorityError(f"Unknown priority components: {', '.join(sorted(unknown))}")
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.now = now
+        self.due_horizon = due_horizon
+        self.today = None
+        self.refresh()
+
+    def refresh(self, now=None):
+        """Measure days-to-due from `now` (default: the fixed time, else today) from here on"""
+        today = (now or self.now or datetime.now()).date().toordinal()
+        if today != self.today:
+            self.today = today
+            # Many tasks share a due date; parse each date string once per day
+            self._due_scores = {}
+
+    @classmethod
+    def from_env(cls):
+        """A model using the weights in PRIORITY_WEIGHTS, if set"""
+        weights = os.getenv('PRIORITY_WEIGHTS')
+        try:
+            return cls(json.loads(weights) if weights else None)
+        except ValueError as e:
+            raise PriorityError(f"PRIORITY_WEIGHTS is not valid JSON: {e}")
+
+    def due_score(self, due_date):
+        score = self._due_scores.get(due_date)
+        if score is None:
+            try:
+                due = parse_due_date(due_date)
+            except ValueError:
+                due = NO_DUE_DATE
+            days = due - self.today
+            if due == NO_DUE_DATE:
+                score = 0.0
+            else:
+                score = 1.0 if days <= 0 else max(0.0, 1.0 - days / self.due_horizon)
+            self._due_scores[due_date] = score
+        return score
+
+    def components(self, task):
+        """The 0..1 value of every component for a task (Task or task dict)"""
+        levels = task.get('maslow_levels') or (task.get('maslow_level'),)
+        return {
+            'importance': _level(task.get('importance'), 0.0),
+            'urgency': _level(task.get('urgency'), 0.0),
+            'impact': _level(task.get('impact'), 0.5),
+            'energy': 1.0 - _level(task.get('energy'), 0.5),
+            'due': self.due_score(task.get('due_date')),
+            'maslow': max(MASLOW_SCORES.get((level or '').lower(), 0.0) for level in levels),
+        }
+
+    def score(self, task):
+        """Weighted sum of a task's components (the same values as `components`, inlined)"""
+        w = self.weights
+        levels = task.get('maslow_levels')
+        if levels:
+            maslow = max(MASLOW_SCORES.get((level or '').lower(), 0.0) for level in levels)
+        else:
+            maslow = MASLOW_SCORES.get((task.get('maslow_level') or '').lower(), 0.0)
+        return (w['importance'] * _level(task.get('importance'), 0.0)
+                + w['urgency'] * _level(task.get('urgency'), 0.0)
+                + w['impact'] * _level(task.get('impact'), 0.5)
+                + w['energy'] * (1.0 - _level(task.get('energy'), 0.5))
+                + w['due'] * self.due_score(task.get('due_date'))
+                + w['maslow'] * maslow)
+
+
+def matches(task, filters):
+    """
+    Whether a task passes `filters`: a predicate, or a dict of field -> value(s).
+
+    Values compare case-insensitively. A tuple/list/set accepts any of its
+    values, and 'maslow_level' also matches a task's other levels.
+    """
+    if not filters:
+        return True
+    if callable(filters):
+        return filters(task)
+    for field, wanted in filters.items():
+        if isinstance(wanted, (tuple, list, set, frozenset)):
+            wanted = {str(value).lower() for value in wanted}
+        else:
+            wanted = {str(wanted).lower()}
+        if field == 'maslow_level':
+            values = task.get('maslow_levels') or (task.get('maslow_level'),)
+        else:
+            values = (task.get(field),)
+        if not any(value is not None and str(value).lower() in wanted for value in values):
+            return False
+    return True
+
+
+def top_k(tasks, n, filters=None, model=None):
+    """The `n` highest-scoring tasks that pass `filters`, best first, from any iterable"""
+    model = model or PriorityModel()
+    model.refresh()
+    candidates = (task for task in tasks if matches(task, filters))
+    return heapq.nlargest(n, candidates, key=model.score)
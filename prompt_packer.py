@@ -0,0 +1,230 @@
+"""Token-budgeted map-reduce prompting for long task lists.
+
+Putting every task into one prompt breaks down on big backlogs. The
+prompt overflows the context window, or the answer is cut off by
+`max_tokens`. `MapReducePrompter.run(items, template, max_tokens)` sends
+`template(items)` as a single request when it fits the reduce budget,
+exactly as before. Otherwise:
+
+1. map: the task lines are packed greedily into chunks of at most
+   `map_budget` prompt tokens. Each chunk asks for a ranked shortlist of
+   its best tasks. Chunks run in parallel, at most `concurrency` at a time.
+   Each shortlisted line is matched back to the chunk's own task name, so
+   only exact names (never the model's commentary) go into later rounds.
+2. reduce: the shortlists are merged into one candidate list. If it still
+   doesn't fit `reduce_budget`, it is shortlisted again the same way, in
+   chunks of `map_budget`.
+3. The final request is the caller's own prompt over the surviving
+   candidates, with its own `max_tokens`. With `stream=True` it is returned
+   as an `llm_cache.ChatStream`, so its answer can be shown as it arrives.
+
+Each round at least halves the list, so latency grows with
+chunks / concurrency (plus a few reduce rounds), not with the number of
+tasks. Requests go through `cached_chat_content`, so the LLM cache and
+GPT metrics apply.
+
+Tokens are counted with tiktoken when it is installed, and estimated at
+four characters per token otherwise.
+
+Configuration (environment):
+
+- LLM_MAP_BUDGET        prompt tokens per map request (default 2000)
+- LLM_REDUCE_BUDGET     prompt tokens for the final request (default 4000)
+- LLM_MAP_MAX_TOKENS    completion tokens per shortlist (default 300)
+- LLM_MAP_SHORTLIST     tasks kept per chunk (default 10)
+- LLM_MAP_CONCURRENCY   map requests in flight (default 4)
+"""
+import functools
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_cache import ChatStream, cached_chat_content
+
+DEFAULT_MAP_BUDGET = 2000
+DEFAULT_REDUCE_BUDGET = 4000
+DEFAULT_MAP_MAX_TOKENS = 300
+DEFAULT_SHORTLIST = 10
+DEFAULT_CONCURRENCY = 4
+
+# Every chat message costs a few tokens of framing on top of its content
+MESSAGE_OVERHEAD = 4
+
+MAP_PROMPT = (
+    "Here is one part of a longer task list:\n\n{task_list}\n\n"
+    "Pick the {keep} tasks from this part that should be done first, considering urgency, "
+    "importance and dependencies. Reply with a numbered list, most important first, "
+    "copying each task name exactly and adding nothing else."
+)
+MERGE_NOTE = "These tasks were shortlisted, most important first, from a longer list.\n\n"
+
+_LIST_MARKER = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+')
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def count_tokens(text, model=None):
+    """Tokens in `text` for `model` (tiktoken if installed, else about four characters per token)"""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def bullet_list(items):
+    return "\n".join(f"- {item}" for item in items)
+
+
+def list_items(content):
+    """The entries of a bulleted or numbered list in a reply, markers stripped"""
+    items = []
+    for line in content.splitlines():
+        match = _LIST_MARKER.match(line)
+        if match and line[match.end():].strip():
+            items.append(line[match.end():].strip())
+    return items
+
+
+def match_items(replies, items):
+    """
+    The entries of `items` named by reply lines, in reply order, without repeats.
+
+    A line matches an item it equals or starts with (ignoring case), so a
+    trailing "- because ..." is dropped. The longest matching item wins.
+    Lines that name no item are skipped.
+    """
+    by_name = {item.lower(): item for item in items}
+    longest_first = sorted(by_name, key=len, reverse=True)
+    matched = []
+    for reply in replies:
+        reply = reply.strip().strip('*"\'').lower()
+        item = by_name.get(reply) or next((by_name[name] for name in longest_first
+                                           if reply.startswith(name)), None)
+        if item is not None and item not in matched:
+            matched.append(item)
+    return matched
+
+
+class MapReducePrompter:
+    def __init__(self, client, cache=None, model="gpt-3.5-turbo",
+                 system="You are a helpful assistant.", temperature=0.7,
+                 map_budget=DEFAULT_MAP_BUDGET, reduce_budget=DEFAULT_REDUCE_BUDGET,
+                 map_max_tokens=DEFAULT_MAP_MAX_TOKENS, shortlist=DEFAULT_SHORTLIST,
+                 concurrency=DEFAULT_CONCURRENCY):
+        """
+        Args:
+            client: An `openai.OpenAI` client (shared by the map threads)
+            cache: Optional LLMCache
+            model (str): Chat model for every stage
+            system (str): System message for every request
+            map_budget (int): Prompt tokens per map request
+            reduce_budget (int): Prompt tokens for the final request
+            map_max_tokens (int): Completion tokens per shortlist
+            shortlist (int): Tasks kept per map chunk
+            concurrency (int): Map requests in flight
+        """
+        self.client = client
+        self.cache = cache
+        self.model = model
+        self.system = system
+        self.temperature = temperature
+        self.map_budget = map_budget
+        self.reduce_budget = reduce_budget
+        self.map_max_tokens = map_max_tokens
+        self.shortlist = shortlist
+        self.concurrency = max(1, concurrency)
+
+    @classmethod
+    def from_env(cls, client, cache=None, **kwargs):
+        """A prompter with budgets and concurrency from the LLM_MAP_*/LLM_REDUCE_* variables"""
+        settings = {
+            'map_budget': int(os.getenv('LLM_MAP_BUDGET', DEFAULT_MAP_BUDGET)),
+            'reduce_budget': int(os.getenv('LLM_REDUCE_BUDGET', DEFAULT_REDUCE_BUDGET)),
+            'map_max_tokens': int(os.getenv('LLM_MAP_MAX_TOKENS', DEFAULT_MAP_MAX_TOKENS)),
+            'shortlist': int(os.getenv('LLM_MAP_SHORTLIST', DEFAULT_SHORTLIST)),
+            'concurrency': int(os.getenv('LLM_MAP_CONCURRENCY', DEFAULT_CONCURRENCY)),
+        }
+        return cls(client, cache, **dict(settings, **kwargs))
+
+    def prompt_tokens(self, prompt):
+        """Prompt tokens of a request with the system message and this user prompt"""
+        return (count_tokens(self.system, self.model) + count_tokens(prompt, self.model)
+                + 2 * MESSAGE_OVERHEAD)
+
+    def pack(self, items, render, budget):
+        """
+        Split items greedily into chunks whose rendered prompt fits `budget` tokens.
+
+        An item that doesn't fit even on its own gets a chunk by itself.
+        """
+        capacity = budget - self.prompt_tokens(render([]))
+        chunks = []
+        chunk, used = [], 0
+        for item in items:
+            cost = count_tokens(f"- {item}\n", self.model)
+            if chunk and used + cost > capacity:
+                chunks.append(chunk)
+                chunk, used = [], 0
+            chunk.append(item)
+            used += cost
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def complete(self, prompt, max_tokens, stream=False):
+        """One request: its content, or a ChatStream of it with `stream=True`"""
+        request = dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.system},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=self.temperature,
+            max_tokens=max_tokens
+        )
+        if stream:
+            return ChatStream(self.client, self.cache, **request)
+        return cached_chat_content(self.client, self.cache, **request)
+
+    def _map_prompt(self, keep):
+        return lambda items: MAP_PROMPT.format(task_list=bullet_list(items), keep=keep)
+
+    def _shortlist(self, chunk):
+        # Keep at most half the chunk so every round shrinks the list
+        keep = max(1, min(self.shortlist, len(chunk) // 2))
+        content = self.complete(self._map_prompt(keep)(chunk), self.map_max_tokens)
+        return match_items(list_items(content), chunk)[:keep]
+
+    def run(self, items, template, max_tokens, stream=False):
+        """
+        Answer `template(items)`, shortlisting the items first if they don't fit one request.
+
+        Args:
+            items (list): Task names (or any one-line strings)
+            template (callable): list of items -> user prompt for the final request
+            max_tokens (int): Completion tokens for the final answer
+            stream (bool): Return the final answer as a ChatStream (map requests still block)
+        """
+        items = list(items)
+        merged = False
+        while len(items) > 1 and self.prompt_tokens(template(items)) > self.reduce_budget:
+            chunks = self.pack(items, self._map_prompt(self.shortlist), self.map_budget)
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(chunks))) as pool:
+                shortlists = list(pool.map(self._shortlist, chunks))
+            candidates = [item for shortlist in shortlists for item in shortlist]
+            if not candidates or len(candidates) >= len(items):
+                break
+            items, merged = candidates, True
+
+        prompt = template(items)
+        return self.complete(MERGE_NOTE + prompt if merged else prompt, max_tokens, stream)
@@ -0,0 +1,212 @@
+"""Streaming renderers for task recommendation reports.
+
+A report is produced as a stream of events rather than one big string,
+starting with the report itself:
+
+    ('report', key, title)
+    ('section', key, title)
+    ('group', key, title)      # title may be None (no heading in text output)
+    ('task', task)
+    ('empty', message)         # a section without tasks
+    ('end_section',)
+
+`render` writes those events to any object with a `write(str)` method
+(sys.stdout, an open file, `socket.makefile('w')`, ...) in one of FORMATS.
+Each event is written as soon as it is produced, so rendering is linear
+in the size of the report and needs no extra memory beyond one line.
+
+Text output is driven by per-report templates (see the task managers'
+*_TEMPLATES), which are compiled once to bound `str.format` methods.
+Markdown, JSON and NDJSON are the same for every report.
+"""
+import functools
+import io
+import json
+import re
+
+FORMATS = ('text', 'markdown', 'json', 'ndjson')
+
+# Text layout: each template is formatted with the event's fields.
+# `separator` goes between sections; `area` and `due` are the optional
+# fragments of a task line.
+DEFAULT_TEXT_TEMPLATES = {
+    'report': "{title}\n\n",
+    'separator': "",
+    'section': "{title}:\n",
+    'group': "\n{title}:\n",
+    'task': "- {name}{area}{due}\n",
+    'area': "",
+    'due': " (Due: {due_date})",
+    'empty': "- {message}\n",
+    'end_section': "",
+}
+
+_MARKDOWN_SPECIAL = re.compile(r'([\\`*_\[\]<>|#])')
+
+
+class RenderError(Exception):
+    """Raised for an unknown output format"""
+
+
+def compile_templates(templates=None):
+    """Compile text templates (merged over the defaults) to bound format methods"""
+    merged = dict(DEFAULT_TEXT_TEMPLATES, **(templates or {}))
+    return {name: template.format for name, template in merged.items()}
+
+
+_DEFAULT_TEMPLATES = compile_templates()
+
+
+def task_fields(task):
+    """A task as a plain dict, whether it is a Task record or a task dict"""
+    return task.to_dict() if hasattr(task, 'to_dict') else dict(task)
+
+
+def _render_text(events, write, templates):
+    t = templates or _DEFAULT_TEMPLATES
+    first_section = True
+    for event in events:
+        kind = event[0]
+        if kind == 'task':
+            task = event[1]
+            area = task.get('area')
+            due_date = task.get('due_date')
+            write(t['task'](
+                name=task['name'],
+                area=t['area'](area=area) if area else "",
+                due=t['due'](due_date=due_date) if due_date else ""
+            ))
+        elif kind == 'section':
+            if not first_section:
+                write(t['separator']())
+            first_section = False
+            write(t['section'](key=event[1], title=event[2]))
+        elif kind == 'group':
+            if event[2] is not None:
+                write(t['group'](key=event[1], title=event[2]))
+        elif kind == 'empty':
+            write(t['empty'](message=event[1]))
+        elif kind == 'end_section':
+            write(t['end_section']())
+        elif kind == 'report':
+            write(t['report'](key=event[1], title=event[2]))
+
+
+def _markdown_escape(text):
+    return _MARKDOWN_SPECIAL.sub(r'\\\1', str(text))
+
+
+def _render_markdown(events, write, templates=None):
+    # Headings are followed by one blank line before the list under them
+    after_heading = False
+    for event in events:
+        kind = event[0]
+        if kind in ('task', 'empty') and after_heading:
+            write("\n")
+            after_heading = False
+        if kind == 'task':
+            task = event[1]
+            line = f"- {_markdown_escape(task['name'])}"
+            if task.get('area'):
+                line += f" — {_markdown_escape(task['area'])}"
+            if task.get('due_date'):
+                line += f" (due {task['due_date']})"
+            write(line + "\n")
+        elif kind == 'section':
+            write(f"\n## {_markdown_escape(event[2])}\n")
+            after_heading = True
+        elif kind == 'group':
+            if event[2] is not None:
+                write(f"\n### {_markdown_escape(event[2])}\n")
+                after_heading = True
+        elif kind == 'empty':
+            write(f"_{_markdown_escape(event[1])}_\n")
+        elif kind == 'report':
+            write(f"# {_markdown_escape(event[2])}\n")
+
+
+def _render_json(events, write, templates=None):
+    # {"report", "title", "sections": [{"key", "title", "tasks": [...]}]}
+    # written piece by piece; each task carries the key of its group
+    dumps = functools.partial(json.dumps, ensure_ascii=False, separators=(',', ':'), default=str)
+    in_section = False
+    first_section = True
+    first_task = True
+    group = None
+    for event in events:
+        kind = event[0]
+        if kind == 'task':
+            fields = task_fields(event[1])
+            if group is not None:
+                fields['group'] = group
+            write(("" if first_task else ",") + dumps(fields))
+            first_task = False
+        elif kind == 'section':
+            if in_section:
+                write("]}")
+            write(("" if first_section else ",")
+                  + f'{{"key":{dumps(event[1])},"title":{dumps(event[2])},"tasks":[')
+            first_section = False
+            in_section = True
+            first_task = True
+            group = None
+        elif kind == 'group':
+            group = event[1]
+        elif kind == 'end_section':
+            if in_section:
+                write("]}")
+            in_section = False
+        elif kind == 'report':
+            write(f'{{"report":{dumps(event[1])},"title":{dumps(event[2])},"sections":[')
+    if in_section:
+        write("]}")
+    write("]}\n")
+
+
+def _render_ndjson(events, write, templates=None):
+    # One object per task, tagged with its report, section and group
+    dumps = functools.partial(json.dumps, ensure_ascii=False, separators=(',', ':'), default=str)
+    report = section = group = None
+    for event in events:
+        kind = event[0]
+        if kind == 'task':
+            fields = dict(task_fields(event[1]), report=report, section=section, group=group)
+            write(dumps(fields) + "\n")
+        elif kind == 'section':
+            section = event[1]
+            group = None
+        elif kind == 'group':
+            group = event[1]
+        elif kind == 'report':
+            report = event[1]
+
+
+_RENDERERS = {
+    'text': _render_text,
+    'markdown': _render_markdown,
+    'json': _render_json,
+    'ndjson': _render_ndjson,
+}
+
+
+def render(events, writer, fmt='text', templates=None):
+    """
+    Stream report events to a writer.
+
+    Args:
+        events (iterable): Report events (see module docs)
+        writer: Any object with a write(str) method
+        fmt (str): One of FORMATS
+        templates (dict): compile_templates() result for this report (text format only)
+    """
+    renderer = _RENDERERS.get(fmt)
+    if renderer is None:
+        raise RenderError(f"Unknown report format '{fmt}', expected one of {', '.join(FORMATS)}")
+    renderer(events, writer.write, templates)
+
+
+def render_to_string(events, fmt='text', templates=None):
+    """Render report events into a string"""
+    buffer = io.StringIO()
+    render(events, buffer, fmt, templates)
+    return buffer.getvalue()
@@ -0,0 +1,149 @@
+"""Batched GPT analysis of task Impact and Energy Required.
+
+Instead of one chat completion per task, `analyze_tasks_batch` packs many
+tasks into a single request and asks for a JSON response that follows
+`ANALYSIS_SCHEMA`. Each returned entry is validated against the allowed
+labels; tasks that are missing or invalid in the reply are retried on
+their own in the next round, up to `max_retries` times.
+"""
+import json
+import logging
+import os
+
+from llm_cache import cached_chat_content
+
+logger = logging.getLogger(__name__)
+
+IMPACT_LEVELS = ('High', 'Medium', 'Low')
+ENERGY_LEVELS = ('High', 'Medium', 'Low')
+
+DEFAULT_MODEL = 'gpt-4o-mini'
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_MAX_RETRIES = 2
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tasks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "impact": {"type": "string", "enum": list(IMPACT_LEVELS)},
+                    "energy": {"type": "string", "enum": list(ENERGY_LEVELS)}
+                },
+                "required": ["id", "impact", "energy"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["tasks"],
+    "additionalProperties": False
+}
+
+SYSTEM_PROMPT = (
+    "You are an assistant that analyzes tasks. For every task you are given, "
+    "estimate its Impact (how much completing it matters) and the Energy "
+    "Required to do it. Answer with one entry per task id, using only the "
+    "labels High, Medium or Low."
+)
+
+
+def build_batch_messages(tasks):
+    """Build the chat messages for a batch of (task_id, task_name) pairs"""
+    task_lines = "\n".join(json.dumps({"id": task_id, "name": name}) for task_id, name in tasks)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Analyze these tasks:\n{task_lines}"}
+    ]
+
+
+def parse_batch_response(content, expected_ids):
+    """
+    Validate a JSON batch reply.
+
+    Args:
+        content (str): Raw message content returned by the model
+        expected_ids (iterable): Task ids that were sent in the batch
+
+    Returns:
+        dict: task_id -> (impact, energy) for every valid entry
+    """
+    expected = set(expected_ids)
+    try:
+        entries = json.loads(content)["tasks"]
+    except (TypeError, ValueError, KeyError) as e:
+        logger.warning(f"Could not decode GPT batch response: {e}")
+        return {}
+
+    results = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        task_id = entry.get("id")
+        impact = entry.get("impact")
+        energy = entry.get("energy")
+        if task_id in expected and impact in IMPACT_LEVELS and energy in ENERGY_LEVELS:
+            results[task_id] = (impact, energy)
+    return results
+
+
+def analysis_model():
+    """The model named by OPENAI_ANALYSIS_MODEL (read at call time, after .env is loaded)"""
+    return os.getenv('OPENAI_ANALYSIS_MODEL', DEFAULT_MODEL)
+
+
+def request_batch(client, tasks, model=None, cache=None):
+    """Send one batch to the chat completions API and return its validated results"""
+    content = cached_chat_content(
+        client,
+        cache,
+        model=model or analysis_model(),
+        messages=build_batch_messages(tasks),
+        response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "task_analysis", "strict": True, "schema": ANALYSIS_SCHEMA}
+        },
+        temperature=0
+    )
+    return parse_batch_response(content, [task_id for task_id, _ in tasks])
+
+
+def analyze_tasks_batch(client, tasks, model=None, batch_size=DEFAULT_BATCH_SIZE,
+                        max_retries=DEFAULT_MAX_RETRIES, cache=None):
+    """
+    Analyze many tasks with as few requests as possible.
+
+    Args:
+        client: An `openai.OpenAI` client
+        tasks (list): (task_id, task_name) pairs
+        model (str): Chat model that supports structured outputs (default OPENAI_ANALYSIS_MODEL)
+        batch_size (int): Tasks per request
+        max_retries (int): Extra rounds for tasks missing from a reply
+        cache: Optional LLMCache; retry rounds bypass it
+
+    Returns:
+        dict: task_id -> (impact, energy); failed tasks are absent
+    """
+    model = model or analysis_model()
+    results = {}
+    remaining = list(tasks)
+    for attempt in range(max_retries + 1):
+        if not remaining:
+            break
+        for start in range(0, len(remaining), batch_size):
+            batch = remaining[start:start + batch_size]
+            try:
+                # A retry round must not replay the cached reply that failed
+                results.update(request_batch(client, batch, model=model,
+                                             cache=cache if attempt == 0 else None))
+            except Exception as e:
+                logger.error(f"Error analyzing task batch with GPT: {e}")
+        remaining = [task for task in remaining if task[0] not in results]
+        if remaining and attempt < max_retries:
+            logger.info(f"Retrying {len(remaining)} tasks missing from GPT batch response.")
+
+    if remaining:
+        logger.warning(f"GPT could not analyze {len(remaining)} tasks.")
+    return results
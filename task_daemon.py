@@ -0,0 +1,302 @@
+"""Long-running serve mode for the task recommendations.
+
+The one-shot scripts rebuild their clients and re-read every task on each
+run. `TaskService` keeps one warm `EnhancedTaskManager` (Notion client,
+compiled property extractors, area index) and the parsed tasks in memory:
+
+- every `POLL_INTERVAL` seconds it delta-syncs the task database into the
+  local mirror and re-parses only the pages that changed (all of them
+  only when the Areas index was rebuilt, since area names/levels feed
+  every task);
+- tasks are also kept in an `IncrementalMatrix`, which moves a task
+  between quadrants the moment its due date crosses an urgency
+  threshold; the poll loop wakes up for those too;
+- rendered reports are cached until a task changes or moves.
+
+`serve` exposes the reports on a local HTTP endpoint:
+
+    GET  /recommendations?format=text|markdown|json|ndjson   Maslow report
+    GET  /eisenhower?format=...                              Eisenhower matrix
+    GET  /distribution                                       Tasks per Maslow level
+    GET  /health                                             Service state (JSON)
+    GET  /metrics                                            Stage timers and API counters
+                                                             (Prometheus text, ?format=json)
+    POST /refresh                                            Poll Notion now
+
+Without NOTION_MIRROR_PATH the mirror is kept in memory for the life of
+the process.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+import eisenhower_manager
+import http_pool
+from enhanced_manager import EnhancedTaskManager, RECOMMENDATION_TEMPLATES
+from eisenhower_matrix import IncrementalMatrix
+from metrics import AREA_LOOKUP, FETCH, METRICS, PARSE
+from renderers import FORMATS, RenderError, render_to_string
+from task_mirror import TaskMirror
+from task_model import TaskTable
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_POLL_INTERVAL = 60
+
+_CONTENT_TYPES = {
+    'text': 'text/plain; charset=utf-8',
+    'markdown': 'text/markdown; charset=utf-8',
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class TaskService:
+    def __init__(self, manager=None, mirror=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.mirror = mirror or TaskMirror(':memory:')
+        self.manager = manager or EnhancedTaskManager(mirror=self.mirror)
+        self.eisenhower = eisenhower_manager.EnhancedTaskManager()
+        self.poll_interval = poll_interval
+        self.tasks = {}
+        self.matrix = IncrementalMatrix()
+        self.version = 0
+        self.last_poll = None
+        self.last_error = None
+        self._areas = None
+        self._lock = threading.Lock()
+        self._reports = {}
+        self._reports_key = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def _parse(self, page, areas, extractor):
+        if page is None:
+            return None
+        with METRICS.stage(PARSE):
+            # Status goes through the compiled extractor, so NOTION_PROPERTY_MAP applies
+            if extractor.extract(page).get('status') == 'Completed':
+                return None
+            return self.manager.parse_task(page, areas, derive_urgency=False, extractor=extractor)
+
+    def _load_areas(self):
+        """The area index, or the last one loaded when it can't be refreshed right now"""
+        try:
+            with METRICS.stage(AREA_LOOKUP):
+                return self.manager.area_index.load()
+        except Exception as e:
+            print(f"Error fetching areas: {str(e)}")
+            return self._areas if self._areas is not None else {}
+
+    def poll(self):
+        """Sync changed pages and re-parse them; returns how many tasks changed"""
+        manager = self.manager
+        extractor = manager.get_extractor(manager.database_id, manager.task_properties)
+        areas = self._load_areas()
+        with METRICS.stage(FETCH):
+            changed_ids = self.mirror.sync(manager.notion, manager.database_id)
+
+        # A rebuilt index with the same contents doesn't need a full re-parse
+        if (areas is not self._areas and areas != self._areas) or not self.tasks:
+            # First load, or the area index was rebuilt: every task may have changed
+            updates = {}
+            for page in self.mirror.iter_pages(manager.database_id):
+                task = self._parse(page, areas, extractor)
+                if task is not None:
+                    updates[page['id']] = task
+            with self._lock:
+                self.tasks = updates
+                self.matrix = IncrementalMatrix()
+                for task in updates.values():
+                    self.matrix.upsert(task)
+                self._areas = areas
+                self.version += 1
+            changed = len(updates)
+        else:
+            updates = {page_id: self._parse(self.mirror.get_page(page_id), areas, extractor)
+                       for page_id in changed_ids}
+            with self._lock:
+                for page_id, task in updates.items():
+                    if task is None:
+                        self.tasks.pop(page_id, None)
+                        self.matrix.remove(page_id)
+                    else:
+                        self.tasks[page_id] = task
+                        self.matrix.upsert(task)
+                changed = len(updates)
+                if changed:
+                    self.version += 1
+        self.last_poll = time.time()
+        return changed
+
+    def advance(self):
+        """Re-classify tasks whose due date crossed an urgency threshold; returns how many"""
+        with self._lock:
+            moved = self.matrix.advance()
+            if moved:
+                self.version += 1
+        return len(moved)
+
+    def _seconds_until_wakeup(self):
+        with self._lock:
+            transition = self.matrix.next_transition()
+        if transition is None:
+            return self.poll_interval
+        wait = (transition - datetime.now()).total_seconds()
+        return max(0.0, min(self.poll_interval, wait))
+
+    def _safe_poll(self):
+        try:
+            self.poll()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Error polling Notion: {str(e)}")
+
+    def run_polling(self):
+        """Poll until `stop` is called; `refresh` wakes the loop early"""
+        next_poll = 0.0
+        while not self._stop.is_set():
+            if self._wake.is_set() or time.monotonic() >= next_poll:
+                self._wake.clear()
+                self._safe_poll()
+                next_poll = time.monotonic() + self.poll_interval
+            self.advance()
+            self._wake.wait(min(self._seconds_until_wakeup(), max(0.0, next_poll - time.monotonic())))
+
+    def refresh(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def table(self):
+        """The current tasks as a TaskTable (urgency already derived by the matrix)"""
+        with self._lock:
+            return TaskTable.from_tasks(list(self.tasks.values()))
+
+    def report(self, name, fmt='text'):
+        """Render a report, reusing the cached copy while nothing has changed"""
+        if fmt not in FORMATS:
+            raise RenderError(f"Unknown report format '{fmt}', expected one of {', '.join(FORMATS)}")
+        self.advance()
+        key = self.version
+        with self._lock:
+            if self._reports_key != key:
+                self._reports = {}
+                self._reports_key = key
+            cached = self._reports.get((name, fmt))
+        if cached is not None:
+            return cached
+
+        if name == 'recommendations':
+            events = self.manager.iter_recommendation_events(self.manager.bucket_tasks(self.table()))
+            rendered = render_to_string(events, fmt, RECOMMENDATION_TEMPLATES)
+        elif name == 'eisenhower':
+            with self._lock:
+                matrix = self.matrix.matrix()
+            rendered = render_to_string(
+                self.eisenhower.iter_recommendation_events(matrix), fmt,
+                eisenhower_manager.RECOMMENDATION_TEMPLATES
+            )
+        elif name == 'distribution':
+            rendered = json.dumps(self.table().level_counts()) + "\n"
+        else:
+            raise KeyError(name)
+
+        with self._lock:
+            if self._reports_key == key:
+                self._reports[(name, fmt)] = rendered
+        return rendered
+
+    def health(self):
+        return {
+            'tasks': len(self.tasks),
+            'version': self.version,
+            'last_poll': self.last_poll,
+            'poll_interval': self.poll_interval,
+            'last_error': self.last_error,
+            'http_pool': http_pool.pool_stats()['sync'],
+        }
+
+
+def make_handler(service):
+    """Build a request handler class bound to a TaskService"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type='application/json'):
+            data = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            name = url.path.strip('/')
+            if name == 'health':
+                return self._send(200, json.dumps(service.health()) + "\n")
+            if name == 'distribution':
+                return self._send(200, service.report('distribution'))
+            if name == 'metrics':
+                if parse_qs(url.query).get('format') == ['json']:
+                    return self._send(200, METRICS.to_json() + "\n")
+                return self._send(200, METRICS.to_prometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+
+            fmt = parse_qs(url.query).get('format', ['text'])[0]
+            try:
+                body = service.report(name, fmt)
+            except KeyError:
+                return self._send(404, json.dumps({'error': f"unknown report '{name}'"}) + "\n")
+            except RenderError as e:
+                return self._send(400, json.dumps({'error': str(e)}) + "\n")
+            self._send(200, body, _CONTENT_TYPES[fmt])
+
+        def do_POST(self):
+            if urlparse(self.path).path.strip('/') != 'refresh':
+                return self._send(404, json.dumps({'error': 'not found'}) + "\n")
+            service.refresh()
+            self._send(202, json.dumps({'refreshing': True}) + "\n")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Poll in the background and serve reports over HTTP until interrupted"""
+    poller = threading.Thread(target=service.run_polling, name='notion-poller', daemon=True)
+    poller.start()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving task recommendations on http://{host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+
+def main():
+    load_dotenv()
+    service = TaskService(
+        mirror=TaskMirror.from_env(),
+        poll_interval=float(os.getenv('POLL_INTERVAL', DEFAULT_POLL_INTERVAL))
+    )
+    serve(
+        service,
+        host=os.getenv('SERVE_HOST', DEFAULT_HOST),
+        port=int(os.getenv('SERVE_PORT', DEFAULT_PORT))
+    )
+
+if __name__ == "__main__":
+    main()
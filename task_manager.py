@@ -1,72 +1,124 @@
-from notion_client import Client
-from openai import OpenAI
 from dotenv import load_dotenv
+from clients import notion_client
+from notion_pagination import iter_parsed
+from notion_schema import compile_extractor, load_property_map
+from notion_query import QueryBuilder
+from priority import PriorityModel, top_k
+from task_model import Task
+from metrics import CLASSIFY, METRICS, run_main
 import os
 
+# Where each task field lives; override with NOTION_PROPERTY_MAP
+TASK_PROPERTIES = {
+    'name': {'type': 'title', 'required': True},
+    'due_date': {'type': 'date'},
+    'importance': {'name': 'Importance', 'type': 'select'},
+    'urgency': {'name': 'Urgency', 'type': 'select'},
+    'impact': {'name': 'Impact', 'type': 'select'},
+    'energy': {'name': 'Energy Required', 'type': 'select'},
+}
+
 class TaskManager:
     def __init__(self):
         load_dotenv()
-        self.notion = Client(auth=os.getenv('NOTION_API_KEY'))
+        self._notion = None
         self.database_id = os.getenv('NOTION_DATABASE_ID')
+        self.task_properties = load_property_map(TASK_PROPERTIES)
+        self._extractor = None
+        self.priority = PriorityModel.from_env()
+
+    @property
+    def notion(self):
+        """The Notion client, created on first use"""
+        if self._notion is None:
+            self._notion = notion_client()
+        return self._notion
+
+    def get_extractor(self):
+        """Compile (once) the property extractor for the task database"""
+        if self._extractor is None:
+            self._extractor = compile_extractor(self.notion, self.database_id, self.task_properties)
+        return self._extractor
         
+    def parse_title(self, page):
+        """Return the title of a Notion page, or None if it has none"""
+        return self.get_extractor().extract(page).get('name')
+
+    def parse_task(self, page):
+        """Extract a Task from a Notion page, or None if it has no name"""
+        fields = self.get_extractor().extract(page)
+        if not fields.get('name'):
+            return None
+        return Task.from_fields(dict(fields, id=page.get('id')))
+
+    def task_query(self):
+        """Newest tasks first, mapped properties only"""
+        return QueryBuilder(self.get_extractor()).sort('Created', 'descending').select()
+
+    def iter_tasks(self):
+        """Stream task titles from Notion, following pagination cursors"""
+        return iter_parsed(self.notion, self.database_id, self.parse_title, **self.task_query().build())
+
+    def iter_records(self):
+        """Stream Task records (title plus the fields used for scoring) from Notion"""
+        return iter_parsed(self.notion, self.database_id, self.parse_task, **self.task_query().build())
+
     def fetch_tasks(self):
         """Fetch tasks from Notion database"""
         try:
-            response = self.notion.databases.query(
-                database_id=self.database_id,
-                sorts=[{
-                    "property": "Created",
-                    "direction": "descending"
-                }]
-            )
-            
-            tasks = []
-            for page in response['results']:
-                for prop_name, prop_data in page['properties'].items():
-                    if prop_data['type'] == 'title':
-                        if prop_data['title']:
-                            task_title = prop_data['title'][0]['text']['content']
-                            tasks.append(task_title)
-                            break
-            
-            return tasks
+            return list(self.iter_tasks())
         
         except Exception as e:
             print(f"Error fetching tasks: {str(e)}")
             return []
 
+    def fetch_records(self):
+        """Fetch Task records from Notion database"""
+        try:
+            return list(self.iter_records())
+
+        except Exception as e:
+            print(f"Error fetching tasks: {str(e)}")
+            return []
+
     def get_task_recommendations(self, tasks):
         """
-        Get mock recommendations for task prioritization
-        Later, this will use the real GPT API
+        Get recommendations for task prioritization from priority scores
+
+        Args:
+            tasks (list): Task records or plain titles; titles all score the
+                same, so they keep their order
         """
         if not tasks:
             return "No tasks found to analyze."
         
         recommendations = "Here's how I suggest prioritizing your tasks:\n\n"
         
-        # Categorize tasks
-        high_priority = tasks[:2]  # First 2 tasks as high priority
-        medium_priority = tasks[2:4]  # Next 2 as medium
-        low_priority = tasks[4:]  # Rest as low priority
+        # Categorize tasks: the 2 best scores, the next 2, then the rest in their original order
+        tasks = [Task(task) if isinstance(task, str) else task for task in tasks]
+        ranked = top_k(tasks, 4, model=self.priority)
+        high_priority = ranked[:2]
+        medium_priority = ranked[2:4]
+        chosen = set(map(id, ranked))
+        low_priority = [task for task in tasks if id(task) not in chosen]
         
         # Format recommendations
         if high_priority:
             recommendations += "🔥 High Priority (Do These First):\n"
             for task in high_priority:
-                recommendations += f"- {task}\n"
+                recommendations += f"- {task['name']}\n"
             recommendations += "\n"
             
         if medium_priority:
             recommendations += "👉 Medium Priority (Schedule These):\n"
             for task in medium_priority:
-                recommendations += f"- {task}\n"
+                recommendations += f"- {task['name']}\n"
             recommendations += "\n"
             
         if low_priority:
             recommendations += "📋 Lower Priority (Can Wait):\n"
             for task in low_priority:
-                recommendations += f"- {task}\n"
+                recommendations += f"- {task['name']}\n"
                 
         return recommendations
 
@@ -76,15 +128,16 @@ def main():
     
     # Fetch and process tasks
     print("\nFetching your tasks from Notion...")
-    tasks = manager.fetch_tasks()
+    tasks = manager.fetch_records()
     
     if tasks:
         print(f"\nFound {len(tasks)} tasks!")
         print("\nAnalyzing and generating recommendations...")
-        recommendations = manager.get_task_recommendations(tasks)
+        with METRICS.stage(CLASSIFY):
+            recommendations = manager.get_task_recommendations(tasks)
         print("\n" + recommendations)
     else:
         print("\nNo tasks found in the database.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_main(main)
\ No newline at end of file
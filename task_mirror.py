@@ -0,0 +1,217 @@
+"""Local SQLite mirror of Notion databases.
+
+The mirror keeps the raw page JSON of every row it has seen, keyed by page
+id, together with a per-database `last_edited_time` watermark. A sync only
+asks Notion for pages edited since that watermark, so warm runs cost one
+small query instead of paging through the whole database.
+
+Pages that come back archived (or that disappear during a full sync) are
+kept as tombstones: their row stays with `archived = 1` and no data, so a
+later delta sync can't resurrect them from a stale copy.
+
+Notion's database query never returns archived or deleted pages, so a
+delta sync can't notice them. Instead, every `reconcile_interval` seconds
+(NOTION_MIRROR_RECONCILE_SECONDS, default 900; 0 means every sync) a
+sync re-reads the whole database and tombstones the pages it no longer
+lists. The first sync of a database is always a full one.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from notion_pagination import iter_query_batches
+
+DEFAULT_MIRROR_PATH = '.notion_mirror.sqlite3'
+DEFAULT_RECONCILE_SECONDS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_id TEXT PRIMARY KEY,
+    database_id TEXT NOT NULL,
+    last_edited_time TEXT,
+    archived INTEGER NOT NULL DEFAULT 0,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_by_database ON pages (database_id, archived);
+CREATE TABLE IF NOT EXISTS sync_state (
+    database_id TEXT PRIMARY KEY,
+    last_edited_time TEXT,
+    synced_at TEXT,
+    reconciled_at TEXT
+);
+"""
+
+
+class TaskMirror:
+    def __init__(self, path=DEFAULT_MIRROR_PATH, reconcile_interval=None):
+        """
+        Args:
+            path (str): SQLite file (or ':memory:')
+            reconcile_interval (float): Seconds between full syncs that tombstone vanished pages
+                (default NOTION_MIRROR_RECONCILE_SECONDS or 900)
+        """
+        self.path = path
+        if reconcile_interval is None:
+            reconcile_interval = float(os.getenv('NOTION_MIRROR_RECONCILE_SECONDS', DEFAULT_RECONCILE_SECONDS))
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sync_state)")}
+        if 'reconciled_at' not in columns:
+            # Mirrors created before reconciliation existed
+            with self.conn:
+                self.conn.execute("ALTER TABLE sync_state ADD COLUMN reconciled_at TEXT")
+
+    @classmethod
+    def from_env(cls):
+        """Open the mirror named by NOTION_MIRROR_PATH, or return None if unset"""
+        path = os.getenv('NOTION_MIRROR_PATH')
+        return cls(path) if path else None
+
+    def close(self):
+        self.conn.close()
+
+    def get_watermark(self, database_id):
+        """Return the newest last_edited_time seen for a database, or None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT last_edited_time FROM sync_state WHERE database_id = ?",
+                (database_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def reconcile_due(self, database_id, now=None):
+        """Whether the next sync of a database should be a full one"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT reconciled_at FROM sync_state WHERE database_id = ?",
+                (database_id,)
+            ).fetchone()
+        if not row or not row[0]:
+            return True
+        now = now or datetime.now(timezone.utc)
+        return (now - datetime.fromisoformat(row[0])).total_seconds() >= self.reconcile_interval
+
+    def sync(self, notion, database_id, full=None):
+        """
+        Bring the mirror of a database up to date.
+
+        Args:
+            notion: A `notion_client.Client`
+            database_id (str): Database to sync
+            full (bool): Re-read every page and tombstone pages that are gone
+                (default: on the first sync and then every `reconcile_interval` seconds)
+
+        Returns:
+            list: Ids of pages that were added, changed or archived
+        """
+        if full is None:
+            full = self.reconcile_due(database_id)
+        watermark = None if full else self.get_watermark(database_id)
+        query = {'sorts': [{"timestamp": "last_edited_time", "direction": "ascending"}]}
+        if watermark:
+            # Notion timestamps are minute-granular, so re-read the boundary minute
+            query['filter'] = {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": watermark}
+            }
+
+        changed = []
+        seen = set()
+        newest = watermark
+        for batch in iter_query_batches(notion, database_id, **query):
+            rows = []
+            for page in batch:
+                seen.add(page['id'])
+                edited = page.get('last_edited_time')
+                if edited and (newest is None or edited > newest):
+                    newest = edited
+                if page.get('archived') or page.get('in_trash'):
+                    rows.append((page['id'], database_id, edited, 1, None))
+                else:
+                    rows.append((page['id'], database_id, edited, 0, json.dumps(page)))
+            changed.extend(self._upsert(rows))
+
+        if full:
+            changed.extend(self._tombstone_missing(database_id, seen))
+
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (database_id, last_edited_time, synced_at, reconciled_at) "
+                "VALUES (?, ?, ?, CASE WHEN ? THEN ? ELSE "
+                "(SELECT reconciled_at FROM sync_state WHERE database_id = ?) END)",
+                (database_id, newest, now, full, now, database_id)
+            )
+        return changed
+
+    def _upsert(self, rows):
+        """Write page rows, returning the ids whose contents actually changed"""
+        changed = []
+        with self._lock, self.conn:
+            for row in rows:
+                current = self.conn.execute(
+                    "SELECT last_edited_time, archived, data FROM pages WHERE page_id = ?",
+                    (row[0],)
+                ).fetchone()
+                if current == row[2:]:
+                    continue
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO pages (page_id, database_id, last_edited_time, archived, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    row
+                )
+                changed.append(row[0])
+        return changed
+
+    def _tombstone_missing(self, database_id, seen):
+        with self._lock, self.conn:
+            live = [
+                page_id for (page_id,) in self.conn.execute(
+                    "SELECT page_id FROM pages WHERE database_id = ? AND archived = 0",
+                    (database_id,)
+                )
+            ]
+            missing = [page_id for page_id in live if page_id not in seen]
+            self.conn.executemany(
+                "UPDATE pages SET archived = 1, data = NULL WHERE page_id = ?",
+                [(page_id,) for page_id in missing]
+            )
+        return missing
+
+    def mark_archived(self, page_id):
+        """Tombstone a page we know has been archived or deleted"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE pages SET archived = 1, data = NULL WHERE page_id = ?",
+                (page_id,)
+            )
+
+    def get_page(self, page_id):
+        """Return the mirrored page object, or None if unknown or archived"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data FROM pages WHERE page_id = ? AND archived = 0",
+                (page_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_pages(self, database_id, batch_size=500):
+        """Yield every live mirrored page of a database, in page id order"""
+        last_id = ''
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT page_id, data FROM pages "
+                    "WHERE database_id = ? AND archived = 0 AND page_id > ? "
+                    "ORDER BY page_id LIMIT ?",
+                    (database_id, last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            for page_id, data in rows:
+                yield json.loads(data)
+            last_id = rows[-1][0]
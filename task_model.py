@@ -0,0 +1,192 @@
+"""Compact task records.
+
+`Task` is a `__slots__` record that replaces the ad-hoc task dicts. Its
+categorical fields (importance, urgency, impact, energy, Maslow level)
+are interned, so every task labelled 'High' shares one string object.
+It also supports the `task['name']` / `task.get('due_date')` access the
+existing code uses, so it can be passed anywhere a task dict was.
+
+`TaskTable` stores many tasks column by column: one small-int code array
+per categorical field and one array of due dates (as date ordinals). The
+Eisenhower and Maslow passes (see eisenhower_engine) work on those arrays
+directly.
+"""
+import sys
+from array import array
+from datetime import date, datetime
+
+IMPORTANT_VALUES = ('high', 'important', 'yes')
+URGENT_VALUES = ('high', 'urgent', 'yes')
+
+QUADRANTS = ('urgent_important', 'not_urgent_important', 'urgent_not_important', 'not_urgent_not_important')
+
+CATEGORICAL_FIELDS = ('importance', 'urgency', 'impact', 'energy', 'maslow_level')
+
+NO_DUE_DATE = 0
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _levels(levels):
+    # Only tasks in more than one level keep the tuple; maslow_level holds the first
+    return tuple(_intern(level) for level in levels) if levels and len(levels) > 1 else None
+
+
+class Task:
+    __slots__ = ('id', 'name', 'due_date', 'importance', 'urgency', 'impact', 'energy',
+                 'area', 'maslow_level', 'maslow_levels', 'project')
+
+    def __init__(self, name, id=None, due_date=None, importance=None, urgency=None, impact=None,
+                 energy=None, area=None, maslow_level=None, maslow_levels=None, project=None):
+        self.id = id
+        self.name = name
+        self.due_date = due_date
+        self.importance = _intern(importance)
+        self.urgency = _intern(urgency)
+        self.impact = _intern(impact)
+        self.energy = _intern(energy)
+        self.area = _intern(area)
+        self.maslow_level = _intern(maslow_level)
+        self.maslow_levels = _levels(maslow_levels)
+        self.project = project
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Build a Task from a dict of extracted fields, ignoring unknown keys"""
+        return cls(**{key: value for key, value in fields.items() if key in cls.__slots__})
+
+    # Mapping-style access, matching the task dicts this class replaces:
+    # a field that is None behaves like a missing key.
+    def __getitem__(self, key):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key == 'maslow_levels':
+            value = _levels(value)
+        elif key in CATEGORICAL_FIELDS:
+            value = _intern(value)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def to_dict(self):
+        """Return the set fields as a plain dict"""
+        return {key: getattr(self, key) for key in self.__slots__ if getattr(self, key) is not None}
+
+    def __eq__(self, other):
+        return isinstance(other, Task) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+
+def parse_due_date(due_date):
+    """Convert a Notion date string (or date/datetime) to a date ordinal, NO_DUE_DATE if unset"""
+    if not due_date:
+        return NO_DUE_DATE
+    if isinstance(due_date, datetime):
+        return due_date.date().toordinal()
+    if isinstance(due_date, date):
+        return due_date.toordinal()
+    return datetime.strptime(due_date.split('T')[0], '%Y-%m-%d').toordinal()
+
+
+class Vocabulary:
+    """Maps the distinct values of one categorical column to small int codes (0 = unset)"""
+
+    def __init__(self):
+        self.values = [None]
+        self.codes = {None: 0}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(_intern(value))
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+    def flags(self, truthy_values, default=None):
+        """Per-code lookup table: does the value's lowercase form fall in `truthy_values`?"""
+        return [
+            (value if value is not None else default or '').lower() in truthy_values
+            for value in self.values
+        ]
+
+
+class TaskTable:
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.due = array('l')
+        self.due_dates = []
+        self.columns = {field: array('H') for field in CATEGORICAL_FIELDS}
+        self.vocabularies = {field: Vocabulary() for field in CATEGORICAL_FIELDS}
+        self.areas = []
+        # Full level tuple for rows in more than one Maslow level, None otherwise
+        self.extra_levels = []
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        table = cls()
+        for task in tasks:
+            table.append(task)
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def append(self, task):
+        """Add a Task (or task dict) as a new row"""
+        self.ids.append(task.get('id'))
+        self.names.append(task.get('name'))
+        self.due_dates.append(task.get('due_date'))
+        try:
+            self.due.append(parse_due_date(task.get('due_date')))
+        except ValueError:
+            self.due.append(NO_DUE_DATE)
+        self.areas.append(_intern(task.get('area')))
+        levels = task.get('maslow_levels')
+        self.extra_levels.append(tuple(levels) if levels and len(levels) > 1 else None)
+        for field in CATEGORICAL_FIELDS:
+            self.columns[field].append(self.vocabularies[field].encode(task.get(field)))
+
+    def value(self, field, row):
+        return self.vocabularies[field].decode(self.columns[field][row])
+
+    def task(self, row):
+        """Rebuild the Task record for one row"""
+        return Task(
+            self.names[row], id=self.ids[row], due_date=self.due_dates[row], area=self.areas[row],
+            maslow_levels=self.extra_levels[row],
+            **{field: self.value(field, row) for field in CATEGORICAL_FIELDS}
+        )
+
+    def __iter__(self):
+        return (self.task(row) for row in range(len(self)))
+
+    def row_levels(self, row, default='Uncategorized'):
+        """Every Maslow level a row belongs to"""
+        return self.extra_levels[row] or (self.value('maslow_level', row) or default,)
+
+    def level_counts(self, default='Uncategorized'):
+        """Number of tasks per Maslow level, in order of first appearance; tasks in several levels count in each"""
+        counts = {}
+        for row in range(len(self)):
+            for level in self.row_levels(row, default):
+                counts[level] = counts.get(level, 0) + 1
+        return counts
@@ -1,146 +1,348 @@
 import os
-import time
-from random import uniform
-from notion_client import Client
-import openai
+import sys
+import json
+import asyncio
 from dotenv import load_dotenv
+from clients import notion_client, openai_client
 import logging
+from notion_pagination import iter_parsed, iter_query_results
+from async_notion import AsyncNotion
+from task_analysis import analyze_tasks_batch, DEFAULT_BATCH_SIZE
+from llm_cache import LLMCache
+from notion_schema import PageExtractor, compile_extractor, load_property_map
+from near_duplicates import DuplicateIndex
+from notion_query import QueryBuilder
+from task_model import Task
+from write_queue import WriteQueue
+from pipeline import DEFAULT_QUEUE_SIZE, Stage, run_pipeline
+from metrics import FETCH, METRICS, PARSE, run_main
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Environment variables
 NOTION_API_KEY = os.getenv("NOTION_API_KEY")
 NOTION_DATABASE_ID = os.getenv("NOTION_DATABASE_ID")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+MAX_CONCURRENT_TASKS = int(os.getenv("MAX_CONCURRENT_TASKS", "3"))
+GPT_BATCH_SIZE = int(os.getenv("GPT_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+# Page updates in flight; by default as many as NOTION_MAX_CONCURRENCY allows
+WRITE_CONCURRENCY = int(os.getenv("NOTION_WRITE_CONCURRENCY", "0")) or None
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+# Copy Impact/Energy from a labeled near-duplicate instead of asking GPT (see near_duplicates)
+REUSE_DUPLICATE_LABELS = os.getenv("REUSE_DUPLICATE_LABELS", "").lower() in ("1", "true", "yes")
 
-# Initialize Notion and OpenAI clients
-notion = Client(auth=NOTION_API_KEY)
-openai.api_key = OPENAI_API_KEY
+# Where each task field lives; override with NOTION_PROPERTY_MAP
+TASK_PROPERTIES = {
+    "name": {"name": "Name", "type": "title", "required": True},
+    "status": {"name": "Status", "type": ["select", "status"]},
+    "impact": {"name": "Impact", "type": "select"},
+    "energy": {"name": "Energy Required", "type": "select"},
+}
+
+# Notion and OpenAI clients, created on first use
+_notion_client = None
+_openai_client = None
+
+def get_notion_client():
+    """Return the shared Notion client, creating it on first use."""
+    global _notion_client
+    if _notion_client is None:
+        _notion_client = notion_client(NOTION_API_KEY)
+    return _notion_client
+
+def get_openai_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai_client(OPENAI_API_KEY)
+    return _openai_client
+
+def warm_openai_client():
+    """Create the OpenAI client ahead of use; a failure is reported when a GPT batch needs it."""
+    try:
+        get_openai_client()
+    except Exception as e:
+        logger.debug(f"OpenAI client not ready yet: {e}")
+
+_llm_cache = None
+
+def get_llm_cache():
+    """Return the LLM response cache configured by LLM_CACHE_PATH, if any."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache.from_env()
+    return _llm_cache
 
 # Utility functions
-def delay_with_jitter():
-    """Add random delay to respect Notion's rate limits."""
-    time.sleep(uniform(0.8, 1.2))
+def iter_notion_database(database_id):
+    """Stream tasks from a Notion database, following pagination cursors."""
+    return iter_query_results(get_notion_client(), database_id)
 
 def fetch_notion_database(database_id):
     """Fetch tasks from a Notion database."""
     try:
-        response = notion.databases.query(database_id=database_id)
-        tasks = response.get('results', [])
+        tasks = list(iter_notion_database(database_id))
         logger.info(f"Fetched {len(tasks)} tasks from the database.")
         return tasks
     except Exception as e:
         logger.error(f"Error fetching database {database_id}: {e}")
         return []
 
-def analyze_task_with_gpt(task_name):
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an assistant that analyzes tasks."},
-                {"role": "user", "content": f"Analyze the task: {task_name}"}
-            ],
-            max_tokens=150
-        )
-        message = response['choices'][0]['message']['content'].strip()
-        # Parse the GPT response into impact and energy values as needed
-        return parse_gpt_response(message)
-    except Exception as e:
-        logger.error(f"Error analyzing task with GPT: {e}")
-        return None, None
+def analyze_tasks_with_gpt(tasks):
+    """Analyze (task_id, task_name) pairs with batched GPT requests."""
+    return analyze_tasks_batch(get_openai_client(), tasks, batch_size=GPT_BATCH_SIZE,
+                               cache=get_llm_cache())
 
+async def compile_task_extractor(api, database_id):
+    """Fetch the task database schema once and compile its property extractor."""
+    database = await api.retrieve_database(database_id)
+    extractor = PageExtractor(database["properties"], load_property_map(TASK_PROPERTIES))
+    for warning in extractor.warnings:
+        logger.warning(warning)
+    return extractor
 
-def update_task_properties(task_id, properties):
-    """Update task properties in Notion."""
-    try:
-        notion.pages.update(page_id=task_id, properties=properties)
-        logger.info(f"Task {task_id} updated successfully.")
-    except Exception as e:
-        logger.error(f"Error updating task {task_id}: {e}")
+def extract_task(task, extractor):
+    """Extract a Task record from a task page, or None to skip it.
 
-def process_task(task):
-    """Process an individual task."""
+    Only the fields we need are kept, so the raw page can be dropped right away.
+    """
     task_id = task.get("id")
-    properties = task.get("properties", {})
 
-    if not properties:
+    if not task.get("properties"):
         logger.warning(f"Task {task_id} has no properties. Skipping.")
-        return
+        return None
+
+    fields = extractor.extract(task)
 
-    # Skip completed or archived tasks
-    status = properties.get('Status', {}).get('select', {}).get('name')
+    # Skip completed or archived tasks (the query already leaves them out when it can)
+    status = fields.get("status")
     if status in ['Completed', 'Archived']:
         logger.info(f"Skipping task {task_id} with status '{status}'.")
-        return
+        return None
+
+    name = fields.get("name") or "Unnamed Task"
+    logger.debug(f"Task fields for '{name}': {fields}")
+
+    return Task(name, id=task_id, impact=fields.get("impact"), energy=fields.get("energy"))
+
+def current_properties(task):
+    """The Impact/Energy values a task page had when it was read."""
+    return {
+        "Impact": {"select": {"name": task.impact} if task.impact else None},
+        "Energy Required": {"select": {"name": task.energy} if task.energy else None},
+    }
+
+def plan_updates(batch, results):
+    """Yield (task, properties, current) for the missing properties GPT filled in for a batch."""
+    for task in batch:
+        gpt_impact, gpt_energy = results.get(task.id, (None, None))
+        if not gpt_impact and not gpt_energy:
+            logger.warning(f"GPT could not generate properties for task {task.id}.")
+            continue
+
+        # Only fill in the properties that were missing
+        current = current_properties(task)
+        update_properties = {}
+        if not task.impact:
+            update_properties["Impact"] = {"select": {"name": gpt_impact}}
+            task.impact = gpt_impact
+        if not task.energy:
+            update_properties["Energy Required"] = {"select": {"name": gpt_energy}}
+            task.energy = gpt_energy
+
+        # Optional: Log the final impact and energy for verification
+        logger.info(f"Task '{task.name}': Impact = {task.impact}, Energy = {task.energy}")
+
+        if update_properties:
+            yield task, update_properties, current
+
+def duplicate_index(threshold=None):
+    """A DuplicateIndex at `threshold`, or at DUPLICATE_THRESHOLD when not given."""
+    return DuplicateIndex(threshold) if threshold else DuplicateIndex.from_env()
+
+def borrowed_labels(batch, labels):
+    """(impact, energy) by task id for the tasks whose name nearly duplicates a labeled task."""
+    results = {}
+    for task in batch:
+        matches = labels.query(task.name)
+        if matches:
+            sibling, (impact, energy), similarity = matches[0]
+            logger.info(f"Task {task.id} ('{task.name}') reuses the labels of near-duplicate "
+                        f"{sibling} (similarity {similarity:.2f}).")
+            results[task.id] = (impact, energy)
+    return results
 
-    # Safely extract task name
-    name_property = properties.get("Name", {}).get("title", [{}])
-    name = name_property[0].get("text", {}).get("content", "Unnamed Task") if name_property else "Unnamed Task"
-
-    # Debug logging for properties
-    logger.info(f"Task Properties for '{name}': {list(properties.keys())}")
-
-    # Safely extract Impact and Energy Required
-    impact_property = properties.get("Impact", {})
-    logger.info(f"Impact Property Raw: {impact_property}")
-
-    # Safely extract impact name
-    impact = (impact_property.get("select", {})['name'] 
-              if impact_property.get("select") 
-              else None)
-
-    energy_property = properties.get("Energy Required", {})
-    logger.info(f"Energy Property Raw: {energy_property}")
-
-    # Safely extract energy name
-    energy = (energy_property.get("select", {})['name'] 
-              if energy_property.get("select") 
-              else None)
-
-    # Check for missing properties
-    if not impact or not energy:
-        logger.info(f"Task {task_id} ('{name}') is missing properties. Sending to GPT.")
-        gpt_impact, gpt_energy = analyze_task_with_gpt(name)
-
-        if gpt_impact or gpt_energy:
-            update_properties = {}
-            if gpt_impact:
-                update_properties["Impact"] = {"select": {"name": gpt_impact}}
-            if gpt_energy:
-                update_properties["Energy Required"] = {"select": {"name": gpt_energy}}
-            
-            if update_properties:
-                update_task_properties(task_id, update_properties)
-                # Update local variables to reflect GPT suggestions
-                impact = gpt_impact or impact
-                energy = gpt_energy or energy
-        else:
-            logger.warning(f"GPT could not generate properties for task {task_id}.")
-
-    # Optional: Log the final impact and energy for verification
-    logger.info(f"Task '{name}': Impact = {impact}, Energy = {energy}")
+async def analyze_batch(batch):
+    """Analyze a batch of extracted tasks with GPT in a worker thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, analyze_tasks_with_gpt, [(task.id, task.name) for task in batch]
+    )
 
 # Main script
-def main():
+async def process_database(database_id, concurrency=MAX_CONCURRENT_TASKS, batch_size=GPT_BATCH_SIZE,
+                           write_concurrency=WRITE_CONCURRENCY, queue_size=PIPELINE_QUEUE_SIZE,
+                           reuse_labels=REUSE_DUPLICATE_LABELS, threshold=None):
+    """Process every task of a database, sending tasks missing properties to GPT in batches.
+
+    The work runs as pipeline stages: fetch pages -> parse -> classify (batch the
+    tasks missing properties) -> GPT analyze -> write back. Bounded queues connect
+    the stages, so GPT requests overlap with Notion paging and writes.
+
+    With `reuse_labels`, every labeled task seen so far (from Notion or from GPT)
+    goes into a DuplicateIndex. A task whose name nearly duplicates one of them
+    takes its Impact/Energy instead of going to GPT. `threshold` overrides
+    DUPLICATE_THRESHOLD for that match.
+    """
+    processed = 0
+    # Build the OpenAI client (and import its SDK) while Notion answers the first requests
+    openai_ready = asyncio.get_running_loop().run_in_executor(None, warm_openai_client)
+    async with AsyncNotion(auth=NOTION_API_KEY) as api:
+        queue = WriteQueue(api)
+        try:
+            extractor = await compile_task_extractor(api, database_id)
+        except Exception as e:
+            logger.error(f"Error fetching database {database_id}: {e}")
+            return processed
+        # Notion drops finished tasks and returns only the mapped properties
+        query = QueryBuilder(extractor).exclude("status", "Completed", "Archived").select()
+        batch = []
+        labels = duplicate_index(threshold) if reuse_labels else None
+
+        def learn(record):
+            if labels is not None and record.impact and record.energy:
+                labels.add(record.id, record.name, (record.impact, record.energy))
+
+        async def fetch():
+            try:
+                pages = api.iter_query_results(database_id, **query.build())
+                async for page in METRICS.atimed_iter(pages, FETCH):
+                    yield page
+            except Exception as e:
+                logger.error(f"Error fetching database {database_id}: {e}")
+
+        async def parse(page):
+            nonlocal processed
+            processed += 1
+            with METRICS.stage(PARSE):
+                record = extract_task(page, extractor)
+            if record is not None:
+                yield record
+
+        async def classify(record):
+            if record.impact and record.energy:
+                logger.info(f"Task '{record.name}': Impact = {record.impact}, Energy = {record.energy}")
+                learn(record)
+                return
+            logger.info(f"Task {record.id} ('{record.name}') is missing properties. Queued for GPT.")
+            batch.append(record)
+            if len(batch) >= batch_size:
+                full = batch[:]
+                batch.clear()
+                yield full
+
+        async def last_batch():
+            if batch:
+                yield batch[:]
+
+        async def analyze(tasks):
+            # Checked here rather than in classify so that siblings labeled since then count too
+            borrowed = borrowed_labels(tasks, labels) if labels is not None else {}
+            if borrowed:
+                METRICS.inc('duplicate_labels_reused_total', len(borrowed))
+                for update in plan_updates([task for task in tasks if task.id in borrowed], borrowed):
+                    yield update
+                tasks = [task for task in tasks if task.id not in borrowed]
+                if not tasks:
+                    return
+            try:
+                await openai_ready
+                results = await analyze_batch(tasks)
+            except Exception as e:
+                logger.error(f"Error processing batch of {len(tasks)} tasks: {e}")
+                return
+            for update in plan_updates(tasks, results):
+                yield update
+            for task in tasks:
+                learn(task)
+
+        async def write(update):
+            task, properties, current = update
+            await queue.write(task.id, properties, current)
+
+        await run_pipeline(fetch(), [
+            Stage("parse", parse, queue_size=queue_size),
+            Stage("classify", classify, queue_size=queue_size, flush=last_batch),
+            # A few batches wait for a free GPT worker; beyond that classify (and fetch) wait
+            Stage("gpt", analyze, concurrency=concurrency, queue_size=concurrency),
+            Stage("write_back", write, concurrency=write_concurrency or api.max_concurrency,
+                  queue_size=queue_size),
+        ])
+
+    summary = queue.summary()
+    if summary:
+        logger.info(
+            f"Write-back: {summary['updated']} updated, {summary['unchanged']} unchanged, "
+            f"{summary['failed']} failed."
+        )
+    return processed
+
+def iter_task_records(database_id):
+    """Stream the open tasks of a database as Task records (blocking client)."""
+    notion = get_notion_client()
+    extractor = compile_extractor(notion, database_id, load_property_map(TASK_PROPERTIES), log=logger.warning)
+    query = QueryBuilder(extractor).exclude("status", "Completed", "Archived").select()
+    return iter_parsed(notion, database_id, lambda page: extract_task(page, extractor), **query.build())
+
+def duplicate_clusters(tasks, index=None):
+    """Group tasks with near-duplicate names: lists of two or more Task records, largest first."""
+    if index is None:
+        index = duplicate_index()
+    by_id = {}
+    for task in tasks:
+        by_id[task.id] = task
+        index.add(task.id, task.name)
+    return [[by_id[task_id] for task_id in cluster] for cluster in index.clusters()]
+
+def report_duplicates(database_id=None, threshold=None, fmt="text", out=sys.stdout):
+    """Print the clusters of near-duplicate open tasks in a database."""
+    try:
+        clusters = duplicate_clusters(iter_task_records(database_id or NOTION_DATABASE_ID),
+                                      duplicate_index(threshold))
+    except Exception as e:
+        logger.error(f"Error fetching database {database_id or NOTION_DATABASE_ID}: {e}")
+        return []
+
+    if fmt == "json":
+        json.dump([[{"id": task.id, "name": task.name, "impact": task.impact, "energy": task.energy}
+                    for task in cluster] for cluster in clusters], out, indent=2)
+        out.write("\n")
+        return clusters
+
+    if not clusters:
+        out.write("No near-duplicate tasks found.\n")
+    for number, cluster in enumerate(clusters, 1):
+        out.write(f"\nCluster {number} ({len(cluster)} tasks):\n")
+        for task in cluster:
+            out.write(f"- {task.name} (Impact: {task.impact or '-'}, Energy: {task.energy or '-'})\n")
+    return clusters
+
+def main(database_id=None, concurrency=MAX_CONCURRENT_TASKS, batch_size=GPT_BATCH_SIZE,
+         write_concurrency=WRITE_CONCURRENCY, reuse_labels=REUSE_DUPLICATE_LABELS, threshold=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     logger.info("Fetching tasks from Notion...")
-    tasks = fetch_notion_database(NOTION_DATABASE_ID)
+    processed = asyncio.run(process_database(database_id or NOTION_DATABASE_ID, concurrency, batch_size,
+                                             write_concurrency, reuse_labels=reuse_labels,
+                                             threshold=threshold))
 
-    if not tasks:
+    if not processed:
         logger.warning("No tasks found or unable to retrieve tasks. Check database contents.")
         return
 
-    logger.info(f"Processing {len(tasks)} tasks...")
-    for task in tasks:
-        process_task(task)
-        delay_with_jitter()
-
-    logger.info("Task processing completed.")
+    logger.info(f"Task processing completed ({processed} tasks).")
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
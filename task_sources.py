@@ -0,0 +1,107 @@
+"""Several task databases, read as one stream ordered by due date.
+
+Tasks can live in more than one Notion database. List them in
+NOTION_TASK_DATABASES as a JSON object that maps each database id to its
+property-map overrides, or to null when it has none. The overrides are
+merged over NOTION_PROPERTY_MAP. A plain list of ids also works:
+
+    NOTION_TASK_DATABASES='{"<work db id>": null, "<home db id>": {"name": "Todo"}}'
+
+When it is unset, NOTION_DATABASE_ID is the only task database.
+
+`merge_streams()` reads the databases concurrently. Each stream must
+already be ordered by due date; the fetchers ask Notion to sort it. Each
+stream is consumed in its own thread into a bounded buffer. A heap-based
+k-way merge (`heapq.merge`) then repeatedly yields the earliest head
+across all of them. Downstream code gets tasks as soon as every database
+has answered its first page. At most `buffer` tasks per database are held
+at once. An error in any database is raised from the merged stream.
+"""
+import heapq
+import json
+import os
+import queue
+import threading
+from collections import namedtuple
+
+from notion_schema import SchemaError, load_property_map
+
+DEFAULT_BUFFER = 200
+
+TaskDatabase = namedtuple('TaskDatabase', ['database_id', 'property_map'])
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def load_task_databases(defaults, env_var='NOTION_TASK_DATABASES'):
+    """The configured task databases, each with its merged property map"""
+    base = load_property_map(defaults)
+    config = os.getenv(env_var)
+    if not config:
+        return [TaskDatabase(os.getenv('NOTION_DATABASE_ID'), base)]
+    try:
+        databases = json.loads(config)
+    except ValueError as e:
+        raise SchemaError(f"{env_var} is not valid JSON: {e}")
+    if isinstance(databases, list):
+        databases = dict.fromkeys(databases)
+    if not databases:
+        raise SchemaError(f"{env_var} lists no databases")
+    return [TaskDatabase(database_id, {**base, **(overrides or {})})
+            for database_id, overrides in databases.items()]
+
+
+def due_date_key(task):
+    """Merge key matching Notion's ascending date sort: earliest first, undated last"""
+    due = task.get('due_date')
+    return (not due, due or '')
+
+
+def iter_in_thread(iterable, buffer=DEFAULT_BUFFER):
+    """Consume `iterable` in a background thread, yielding its items through a bounded queue"""
+    items = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up once the consumer has gone away instead of blocking forever
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def merge_streams(streams, key=due_date_key, buffer=DEFAULT_BUFFER):
+    """Merge iterables that are each sorted by `key` into one sorted stream, reading them concurrently"""
+    streams = list(streams)
+    if len(streams) == 1:
+        return iter(streams[0])
+    return heapq.merge(*(iter_in_thread(stream, buffer) for stream in streams), key=key)
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from priority import PriorityModel, top_k
+
+
+def test_due_scores_follow_the_date(monkeypatch):
+    start = datetime(2024, 3, 1, 23, 0)
+    clock = [start]
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock[0]
+
+    monkeypatch.setattr('priority.datetime', FakeDatetime)
+    model = PriorityModel()
+    task = {'name': 'Pay rent', 'due_date': '2024-03-08'}
+    assert model.due_score(task['due_date']) == 1.0 - 7 / 14
+
+    # The same model, two days later: the cached score must not be reused
+    clock[0] = start + timedelta(days=2)
+    top_k([task], 1, model=model)
+    assert model.due_score(task['due_date']) == 1.0 - 5 / 14
+
+
+def test_fixed_now_is_kept():
+    model = PriorityModel(now=datetime(2024, 3, 1))
+    top_k([{'due_date': '2024-03-01'}], 1, model=model)
+    assert model.today == datetime(2024, 3, 1).toordinal()
+    model.refresh(datetime(2024, 3, 10))
+    assert model.due_score('2024-03-08') == 1.0
@@ -0,0 +1,51 @@
+import pytest
+
+from clients import notion_client
+from fake_services import FakeWorkspace, start_fake_server
+from task_mirror import TaskMirror
+
+
+@pytest.fixture
+def workspace(monkeypatch):
+    server, workspace, _ = start_fake_server(FakeWorkspace(tasks=250, seed=2))
+    monkeypatch.setenv('NOTION_BASE_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv('NOTION_API_KEY', 'test')
+    yield workspace
+    server.shutdown()
+
+
+def live_ids(mirror, database_id):
+    return {page['id'] for page in mirror.iter_pages(database_id)}
+
+
+def test_archived_page_is_tombstoned_on_reconcile(workspace):
+    notion = notion_client()
+    database_id = workspace.tasks_database_id
+    mirror = TaskMirror(':memory:', reconcile_interval=0)
+
+    mirror.sync(notion, database_id)
+    before = live_ids(mirror, database_id)
+    assert len(before) == 250
+
+    archived = sorted(before)[0]
+    notion.pages.update(page_id=archived, archived=True)
+
+    assert mirror.sync(notion, database_id) == [archived]
+    assert live_ids(mirror, database_id) == before - {archived}
+    assert mirror.get_page(archived) is None
+
+
+def test_delta_syncs_between_reconciles(workspace):
+    notion = notion_client()
+    database_id = workspace.tasks_database_id
+    mirror = TaskMirror(':memory:', reconcile_interval=3600)
+
+    # The first sync always reconciles, the next one only asks for edits
+    mirror.sync(notion, database_id)
+    assert not mirror.reconcile_due(database_id)
+    archived = sorted(live_ids(mirror, database_id))[0]
+    notion.pages.update(page_id=archived, archived=True)
+    assert archived not in mirror.sync(notion, database_id)
+
+    assert mirror.sync(notion, database_id, full=True) == [archived]
+    assert archived not in live_ids(mirror, database_id)
@@ -0,0 +1,162 @@
+"""Coalescing write-back queue for Notion page property updates.
+
+Instead of calling `pages.update` inline for every task, callers `put`
+the properties they want on a page. The queue
+
+- drops properties whose proposed value already matches the page's
+  current value (or the value this queue last wrote),
+- merges several updates to the same page into one request, and
+- flushes pending pages concurrently through an `AsyncNotion`, so every
+  write goes through its rate limiter and retry handling.
+
+Callers that already limit how many writes run at once, like the
+write-back stage of the enrichment pipeline, can `write` one page right
+away instead of batching.
+
+Each flush returns one `WriteOutcome` per page: 'updated', 'unchanged'
+(every proposed value was already there) or 'failed'.
+"""
+import asyncio
+import logging
+from collections import Counter, namedtuple
+
+from metrics import METRICS, WRITE_BACK
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SIZE = 50
+
+WriteOutcome = namedtuple('WriteOutcome', ['page_id', 'status', 'properties', 'error'])
+
+
+def _names(options):
+    return frozenset(option.get('name') for option in options or ())
+
+
+def _ids(items):
+    return frozenset(item.get('id') for item in items or ())
+
+
+def _text(fragments):
+    return ''.join(
+        fragment.get('plain_text') or (fragment.get('text') or {}).get('content', '')
+        for fragment in fragments or ()
+    )
+
+
+_NORMALIZERS = {
+    'select': lambda data: data.get('name') if data else None,
+    'status': lambda data: data.get('name') if data else None,
+    'multi_select': _names,
+    'title': _text,
+    'rich_text': _text,
+    'date': lambda data: (data.get('start'), data.get('end')) if data else None,
+    'relation': _ids,
+    'people': _ids,
+    'number': lambda data: data,
+    'checkbox': lambda data: data,
+    'url': lambda data: data,
+    'email': lambda data: data,
+    'phone_number': lambda data: data,
+}
+
+
+def normalize_value(value):
+    """
+    Reduce a property value to something comparable.
+
+    Works on both the shape Notion returns when reading a page (with a
+    'type' key, option ids, colors, ...) and the shape sent to pages.update.
+    """
+    if value is None:
+        return None
+    kind = value.get('type') or next((key for key in value if key in _NORMALIZERS), None)
+    normalize = _NORMALIZERS.get(kind)
+    if normalize is None:
+        # Unknown property type: compare as is, which at worst means a redundant write
+        return value
+    return kind, normalize(value.get(kind))
+
+
+def diff_properties(proposed, current):
+    """Return the proposed properties whose value differs from `current`"""
+    current = current or {}
+    return {
+        name: value for name, value in proposed.items()
+        if name not in current or normalize_value(current[name]) != normalize_value(value)
+    }
+
+
+class WriteQueue:
+    def __init__(self, api, flush_size=DEFAULT_FLUSH_SIZE):
+        """
+        Args:
+            api: An AsyncNotion; its rate limit and concurrency bound every flush
+            flush_size (int): Pending pages that trigger a flush from `put`
+        """
+        self.api = api
+        self.flush_size = flush_size
+        self.outcomes = []
+        self._pending = {}
+        self._known = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def propose(self, page_id, properties, current=None):
+        """
+        Queue property values for a page, merged over anything already queued for it.
+
+        Args:
+            page_id (str): Page to update
+            properties (dict): Property name -> pages.update value
+            current (dict): The page's current properties, if known
+        """
+        known = self._known.setdefault(page_id, {})
+        if current:
+            for name, value in current.items():
+                known.setdefault(name, value)
+        pending = self._pending.setdefault(page_id, {})
+        pending.update(properties)
+
+    async def put(self, page_id, properties, current=None):
+        """Queue an update, flushing once `flush_size` pages are pending"""
+        self.propose(page_id, properties, current)
+        if len(self._pending) >= self.flush_size:
+            await self.flush()
+
+    async def _write(self, page_id, proposed):
+        changes = diff_properties(proposed, self._known.get(page_id))
+        if not changes:
+            logger.debug(f"Task {page_id} already up to date.")
+            return WriteOutcome(page_id, 'unchanged', {}, None)
+        try:
+            await self.api.update_page(page_id, changes)
+        except Exception as e:
+            logger.error(f"Error updating task {page_id}: {e}")
+            return WriteOutcome(page_id, 'failed', changes, e)
+        self._known.setdefault(page_id, {}).update(changes)
+        logger.info(f"Task {page_id} updated successfully.")
+        return WriteOutcome(page_id, 'updated', changes, None)
+
+    async def write(self, page_id, properties, current=None):
+        """Write one page's update (merged with anything queued for it) now and return its outcome"""
+        self.propose(page_id, properties, current)
+        with METRICS.stage(WRITE_BACK):
+            outcome = await self._write(page_id, self._pending.pop(page_id))
+        self.outcomes.append(outcome)
+        return outcome
+
+    async def flush(self):
+        """Write every pending page concurrently and return their outcomes"""
+        pending, self._pending = self._pending, {}
+        with METRICS.stage(WRITE_BACK):
+            outcomes = await asyncio.gather(
+                *(self._write(page_id, properties) for page_id, properties in pending.items())
+            )
+        self.outcomes.extend(outcomes)
+        return list(outcomes)
+
+    def summary(self):
+        """Number of pages per outcome status across all flushes"""
+        return Counter(outcome.status for outcome in self.outcomes)